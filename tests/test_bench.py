@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+from serial.serialutil import SerialException
+
+from usbtool import usbtool
+from usbtool.probes import HexProbe
+
+
+class FakeSerial:
+    """
+    echo port: written bytes are readable right away, passed through transform
+    """
+
+    def __init__(self, transform=lambda _: _, short_write: bool = False) -> None:
+        self.port = "/dev/ttyUSB0"
+        self.timeout = None
+        self.transform = transform
+        self.short_write = short_write
+        self.buffer = bytearray()
+        self.calls: list[str] = []
+
+    @property
+    def in_waiting(self) -> int:
+        return len(self.buffer)
+
+    def write(self, data: bytes) -> int:
+        self.calls.append("write")
+        if self.short_write:
+            return len(data) - 1
+        self.buffer += self.transform(data)
+        return len(data)
+
+    def read(self, size: int) -> bytes:
+        self.calls.append("read")
+        _data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return _data
+
+    def flush(self) -> None:
+        pass
+
+    def reset_input_buffer(self) -> None:
+        self.buffer.clear()
+
+    def reset_output_buffer(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+@pytest.fixture
+def fake_serial(monkeypatch):
+    _serial = FakeSerial()
+
+    class _SerialMinimal:
+        def __init__(self, **kwargs) -> None:
+            self.ser = _serial
+
+    monkeypatch.setattr(usbtool, "SerialMinimal", _SerialMinimal)
+    return _serial
+
+
+def test_percentile() -> None:
+    assert usbtool.percentile([], 50) is None
+    assert usbtool.percentile([3.0], 99) == 3.0
+    _values = [float(_) for _ in range(100, 0, -1)]
+    assert usbtool.percentile(_values, 50) == 50.0
+    assert usbtool.percentile(_values, 90) == 90.0
+    assert usbtool.percentile(_values, 99) == 99.0
+    assert usbtool.percentile(_values, 100) == 100.0
+    assert usbtool.percentile(_values, 0) == 1.0
+
+
+def test_recommend_timeout() -> None:
+    assert usbtool.recommend_timeout(None) is None
+    # fast replies get the 20ms floor of slack
+    assert usbtool.recommend_timeout(0.001) == 0.021
+    assert usbtool.recommend_timeout(0.0) == 0.02
+    # slow replies get 3x, rounded up to whole ms
+    assert usbtool.recommend_timeout(0.1) == 0.3
+    assert usbtool.recommend_timeout(0.1234) == 0.371
+
+
+def test_benchmark_port_echo(fake_serial: FakeSerial) -> None:
+    _result = usbtool.benchmark_port(
+        Path("/dev/ttyUSB0"),
+        baud_rate=115200,
+        probe=HexProbe(command_hex="aabb", response_hex="aabb"),
+        iterations=5,
+        timeout=0.1,
+        throughput_bytes=1000,
+    )
+    assert (_result.iterations, _result.failures) == (5, 0)
+    assert _result.open_latency is not None
+    assert _result.first_byte_latency <= _result.round_trip_p50 <= _result.round_trip_p99
+    assert _result.recommended_timeout == usbtool.recommend_timeout(_result.round_trip_p99)
+    assert _result.throughput > 0
+
+
+def test_benchmark_port_no_reply(fake_serial: FakeSerial) -> None:
+    fake_serial.transform = lambda _: b""
+    _result = usbtool.benchmark_port(
+        Path("/dev/ttyUSB0"),
+        baud_rate=115200,
+        probe=HexProbe(command_hex="aa", response_hex="bb"),
+        iterations=3,
+        timeout=0.01,
+        throughput_bytes=100,
+    )
+    assert (_result.iterations, _result.failures) == (3, 3)
+    assert _result.round_trip_p99 is None
+    assert _result.recommended_timeout is None
+    assert _result.throughput is None
+
+
+def test_benchmark_port_short_write(fake_serial: FakeSerial) -> None:
+    fake_serial.short_write = True
+    _result = usbtool.benchmark_port(
+        Path("/dev/ttyUSB0"),
+        baud_rate=115200,
+        probe=HexProbe(command_hex="aa", response_hex="aa"),
+        iterations=3,
+        timeout=0.01,
+        throughput_bytes=100,
+    )
+    assert _result.failures == 3
+    assert _result.throughput is None
+
+
+def test_benchmark_port_open_failure(monkeypatch) -> None:
+    def _serial_minimal(**kwargs):
+        raise SerialException("could not open port")
+
+    monkeypatch.setattr(usbtool, "SerialMinimal", _serial_minimal)
+    _result = usbtool.benchmark_port(
+        Path("/dev/ttyUSB0"),
+        baud_rate=115200,
+        probe=HexProbe(command_hex="aa", response_hex="aa"),
+        iterations=4,
+    )
+    assert (_result.open_latency, _result.failures) == (None, 4)
+
+
+def test_echo_throughput_reads_while_writing() -> None:
+    _serial = FakeSerial()
+    _payload = bytes(_ % 256 for _ in range(1000))
+    assert usbtool.measure_echo_throughput(_serial, _payload, timeout=1, chunk_size=100) > 0
+    # the echo is drained between chunks, not after the whole payload is written
+    assert _serial.calls[:4] == ["write", "read", "write", "read"]
+    assert _serial.calls.count("write") == 10
+
+
+def test_echo_throughput_corrupt_echo() -> None:
+    _serial = FakeSerial(transform=lambda _: _.replace(b"\x05", b"\x06"))
+    _payload = bytes(_ % 256 for _ in range(1000))
+    assert usbtool.measure_echo_throughput(_serial, _payload, timeout=1, chunk_size=100) is None
+    # gave up at the first bad chunk
+    assert _serial.calls.count("write") == 1
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from usbtool.capture import HEADER
+from usbtool.capture import KIND_PORT
+from usbtool.capture import KIND_RX
+from usbtool.capture import RECORD
+from usbtool.capture import SerialCapture
+from usbtool.capture import read_capture
+
+
+def test_round_trip(tmp_path: Path) -> None:
+    with SerialCapture(tmp_path) as capture:
+        _port_a = capture.port_id("/dev/ttyUSB0")
+        _port_b = capture.port_id("/dev/ttyUSB1")
+        assert capture.port_id("/dev/ttyUSB0") == _port_a
+        capture.tx(_port_a, b"\x10\x02SA\x10\x03")
+        capture.rx(_port_a, b"\x06SA")
+        capture.tx(_port_b, b"")
+        capture.rx(_port_b, bytes(range(256)))
+
+    _records = list(read_capture(capture.path))
+    assert [(_.port, _.direction, _.data) for _ in _records] == [
+        ("/dev/ttyUSB0", "tx", b"\x10\x02SA\x10\x03"),
+        ("/dev/ttyUSB0", "rx", b"\x06SA"),
+        ("/dev/ttyUSB1", "tx", b""),
+        ("/dev/ttyUSB1", "rx", bytes(range(256))),
+    ]
+    _timestamps = [_.timestamp for _ in _records]
+    assert _timestamps == sorted(_timestamps)
+
+
+def test_tx_timestamp_is_kept(tmp_path: Path) -> None:
+    with SerialCapture(tmp_path) as capture:
+        _port = capture.port_id("/dev/ttyUSB0")
+        capture.tx(_port, b"a", timestamp=0)
+        capture.rx(_port, b"b")
+
+    _tx, _rx = read_capture(capture.path)
+    assert _tx.timestamp < _rx.timestamp
+
+
+def test_one_file_per_session(tmp_path: Path) -> None:
+    with SerialCapture(tmp_path) as capture:
+        for _ in range(10):
+            capture.tx(capture.port_id(f"/dev/ttyUSB{_}"), b"x")
+    assert list(tmp_path.iterdir()) == [capture.path]
+
+
+def test_truncated_record(tmp_path: Path) -> None:
+    with SerialCapture(tmp_path) as capture:
+        capture.rx(capture.port_id("/dev/ttyUSB0"), b"0123456789")
+    _data = capture.path.read_bytes()
+
+    capture.path.write_bytes(_data[:-1])
+    with pytest.raises(ValueError, match="truncated"):
+        list(read_capture(capture.path))
+
+    capture.path.write_bytes(_data[: HEADER.size + RECORD.size - 1])
+    with pytest.raises(ValueError, match="truncated"):
+        list(read_capture(capture.path))
+
+
+def test_corrupt_record(tmp_path: Path) -> None:
+    with SerialCapture(tmp_path) as capture:
+        capture.port_id("/dev/ttyUSB0")
+    _data = capture.path.read_bytes()
+
+    capture.path.write_bytes(_data + RECORD.pack(0, 7, 0, 1) + b"x")
+    with pytest.raises(ValueError, match="corrupt, unknown record kind 7"):
+        list(read_capture(capture.path))
+
+    capture.path.write_bytes(_data + RECORD.pack(0, KIND_RX, 1, 1) + b"x")
+    with pytest.raises(ValueError, match="corrupt, port id 1 was not declared"):
+        list(read_capture(capture.path))
+
+    _port = "/dev/ttyUSB1".encode("utf8")
+    capture.path.write_bytes(
+        _data + RECORD.pack(0, KIND_PORT, 1, len(_port)) + _port + RECORD.pack(0, KIND_RX, 1, 1) + b"x"
+    )
+    assert [(_.port, _.data) for _ in read_capture(capture.path)] == [("/dev/ttyUSB1", b"x")]
+
+
+def test_not_a_capture_file(tmp_path: Path) -> None:
+    _path = tmp_path / "capture.usbcap"
+    _path.write_bytes(b"x" * HEADER.size)
+    with pytest.raises(ValueError, match="not a capture file"):
+        list(read_capture(_path))
+
+    _path.write_bytes(b"x")
+    with pytest.raises(ValueError, match="too short"):
+        list(read_capture(_path))
+
+
+def test_writer_error_is_raised_by_close(tmp_path: Path) -> None:
+    capture = SerialCapture(tmp_path)
+
+    def _write(data: bytes) -> int:
+        raise OSError(28, "No space left on device")
+
+    capture._file.write = _write
+    capture.tx(capture.port_id("/dev/ttyUSB0"), b"x")
+    with pytest.raises(OSError, match="failed"):
+        capture.close()
+    assert capture._file.closed
+
+
+def test_dead_writer_stops_enqueuing(tmp_path: Path) -> None:
+    capture = SerialCapture(tmp_path)
+
+    def _write(data: bytes) -> int:
+        raise OSError(28, "No space left on device")
+
+    capture._file.write = _write
+    _port = capture.port_id("/dev/ttyUSB0")
+    capture._thread.join()
+    with pytest.raises(OSError, match="failed"):
+        capture.tx(_port, b"x")
+    with pytest.raises(OSError, match="failed"):
+        capture.rx(_port, b"x")
+    with pytest.raises(OSError, match="failed"):
+        capture.port_id("/dev/ttyUSB1")
+    assert capture._queue.empty()
+    with pytest.raises(OSError, match="failed"):
+        capture.close()
+
+
+def test_closed_capture(tmp_path: Path) -> None:
+    with SerialCapture(tmp_path) as capture:
+        _port = capture.port_id("/dev/ttyUSB0")
+    with pytest.raises(OSError, match="closed"):
+        capture.tx(_port, b"x")
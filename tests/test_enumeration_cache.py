@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from usbtool import usbtool
+
+
+@pytest.fixture
+def generation(monkeypatch) -> dict:
+    usbtool.refresh()
+    _state = {"generation": 0, "checks": 0}
+
+    def _get_enumeration_generation() -> tuple:
+        _state["checks"] += 1
+        return (_state["generation"],)
+
+    monkeypatch.setattr(usbtool, "get_enumeration_generation", _get_enumeration_generation)
+    yield _state
+    usbtool.refresh()
+
+
+def test_hit_while_generation_is_stable(generation: dict) -> None:
+    _calls = []
+
+    @usbtool.enumeration_cache
+    def _list(x: int) -> list[int]:
+        _calls.append(x)
+        return [x]
+
+    assert _list(1) == [1]
+    assert _list(1) == [1]
+    assert _list(2) == [2]
+    assert _calls == [1, 2]
+
+
+def test_invalidated_when_generation_changes(generation: dict) -> None:
+    _calls = []
+
+    @usbtool.enumeration_cache
+    def _list() -> list[int]:
+        _calls.append(None)
+        return [len(_calls)]
+
+    assert _list() == [1]
+    generation["generation"] += 1
+    assert _list() == [2]
+    assert _list() == [2]
+
+
+def test_exceptions_are_not_cached(generation: dict) -> None:
+    _calls = []
+
+    @usbtool.enumeration_cache
+    def _flaky() -> str:
+        _calls.append(None)
+        if len(_calls) == 1:
+            raise ValueError("not yet")
+        return "ok"
+
+    with pytest.raises(ValueError):
+        _flaky()
+    assert _flaky() == "ok"
+    assert _flaky() == "ok"
+    assert len(_calls) == 2
+
+
+def test_refresh(generation: dict) -> None:
+    _calls = []
+
+    @usbtool.enumeration_cache
+    def _list() -> list[int]:
+        _calls.append(None)
+        return []
+
+    _list()
+    usbtool.refresh()
+    _list()
+    assert len(_calls) == 2
+
+
+def test_results_are_copies(generation: dict) -> None:
+    @usbtool.enumeration_cache
+    def _list() -> list[int]:
+        return [1]
+
+    @usbtool.enumeration_cache
+    def _dict() -> dict[str, int]:
+        return {"a": 1}
+
+    _list().append(2)
+    _dict()["b"] = 2
+    assert _list() == [1]
+    assert _dict() == {"a": 1}
+
+
+def test_keyword_and_positional_calls_share_an_entry(generation: dict) -> None:
+    _calls = []
+
+    @usbtool.enumeration_cache
+    def _get(usb_id: str, verbose: bool = False) -> str:
+        _calls.append(usb_id)
+        return usb_id
+
+    assert _get("0403:6001") == "0403:6001"
+    assert _get(usb_id="0403:6001") == "0403:6001"
+    assert _get("0403:6001", verbose=False) == "0403:6001"
+    assert _calls == ["0403:6001"]
+    with pytest.raises(TypeError):
+        _get(nope=1)
+
+
+def test_get_devices_for_usb_id_keyword(generation: dict, monkeypatch) -> None:
+    # the public api accepted usb_id= before it was cached
+    monkeypatch.setattr(usbtool, "get_usb_id_dict", lambda: {"0403:6001": "FTDI"})
+    monkeypatch.setattr(
+        usbtool,
+        "get_usb_tty_device_list",
+        lambda: [Path("/sys/bus/usb-serial/devices/ttyUSB0")],
+    )
+    monkeypatch.setattr(usbtool, "get_usb_id_for_device", lambda _: "0403:6001")
+
+    def _get_usb_tty_device(device: Path):
+        raise ValueError(device)
+
+    monkeypatch.setattr(usbtool, "get_usb_tty_device", _get_usb_tty_device)
+
+    assert usbtool.get_devices_for_usb_id(usb_id="0403:6001") == [Path("/dev/ttyUSB0")]
+    assert usbtool.get_devices_for_usb_id("0403:6001") == [Path("/dev/ttyUSB0")]
+
+
+def test_one_generation_check_per_outermost_call(generation: dict) -> None:
+    @usbtool.enumeration_cache
+    def _inner(x: int) -> int:
+        return x
+
+    @usbtool.enumeration_cache
+    def _outer() -> list[int]:
+        return [_inner(_) for _ in range(10)]
+
+    _outer()
+    assert generation["checks"] == 1
+    _outer()
+    assert generation["checks"] == 2
+
+    generation["checks"] = 0
+    with usbtool.pinned_enumeration_generation():
+        for _ in range(10):
+            _inner(_)
+    assert generation["checks"] == 1
+
+    # the pin is released afterwards
+    _inner(0)
+    assert generation["checks"] == 2
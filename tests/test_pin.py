@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from usbtool import usbtool
+from usbtool.probes import ModbusRtuProbe
+
+
+def _usb_tty_device(
+    device: str,
+    port_path: str,
+    serial_number: str | None = "FT1",
+    interface_number: int = 0,
+) -> usbtool.UsbTtyDevice:
+    _usb_device = Path(f"/sys/devices/usb1/{port_path}")
+    return usbtool.UsbTtyDevice(
+        device=Path(device),
+        usb_device=_usb_device,
+        interface=_usb_device / f"{port_path}:1.{interface_number}",
+        interface_number=interface_number,
+        usb_id="0403:6011",
+        serial_number=serial_number,
+        manufacturer="FTDI",
+        product="Quad RS232-HS",
+        busnum=1,
+        devnum=5,
+    )
+
+
+def test_parse_device_spec() -> None:
+    assert usbtool.parse_device_spec("gps:usb_id=0403:6011,interface_number=2") == (
+        "gps",
+        {"baud_rate": 9600, "usb_id": "0403:6011", "interface_number": 2},
+    )
+    assert usbtool.parse_device_spec("plc-1.a_b:probe=modbus-rtu,probe.address=5,timeout=0.2") == (
+        "plc-1.a_b",
+        {"baud_rate": 9600, "probe": ModbusRtuProbe(address=5), "timeout": 0.2},
+    )
+
+
+@pytest.mark.parametrize(
+    "spec",
+    [
+        "my gps:usb_id=0403:6011",
+        'a"b:usb_id=0403:6011',
+        "a$b:usb_id=0403:6011",
+        "a%b:usb_id=0403:6011",
+        "a/b:usb_id=0403:6011",
+        "a*:usb_id=0403:6011",
+        "..:usb_id=0403:6011",
+        ":usb_id=0403:6011",
+        "gps",
+        "gps:usb_id",
+        "gps:nope=1",
+        "gps:probe.address=5,usb_id=0403:6011",
+        "gps:probe=nope",
+    ],
+)
+def test_parse_device_spec_rejects(spec: str) -> None:
+    with pytest.raises(ValueError):
+        usbtool.parse_device_spec(spec)
+
+
+def test_read_device_specs_duplicate(tmp_path: Path) -> None:
+    _spec_file = tmp_path / "specs"
+    _spec_file.write_text("# comment\n\ngps:usb_id=0403:6011\n")
+    assert list(usbtool.read_device_specs(["plc:serial_number=FT1"], _spec_file)) == ["plc", "gps"]
+    with pytest.raises(ValueError, match="duplicate"):
+        usbtool.read_device_specs(["gps:serial_number=FT1"], _spec_file)
+
+
+def test_stable_udev_match_prefers_unique_serial() -> None:
+    _device = _usb_tty_device("/dev/ttyUSB2", "1-1.2", interface_number=2)
+    _sibling = _usb_tty_device("/dev/ttyUSB1", "1-1.2", interface_number=1)
+    assert usbtool.get_stable_udev_match(_device, [_device, _sibling]) == (
+        'ATTRS{idVendor}=="0403", ATTRS{idProduct}=="6011", '
+        'ATTRS{serial}=="FT1", ENV{ID_USB_INTERFACE_NUM}=="02"'
+    )
+
+
+@pytest.mark.parametrize(
+    "serial_number",
+    [None, "", "FT 1", 'FT"1', "FT$1", "FT%n", "FT*"],
+)
+def test_stable_udev_match_unsafe_or_missing_serial(serial_number: str | None) -> None:
+    _device = _usb_tty_device("/dev/ttyUSB0", "1-1.2", serial_number=serial_number)
+    assert usbtool.get_stable_udev_match(_device, [_device]) == 'KERNELS=="1-1.2:1.0"'
+
+
+def test_stable_udev_match_duplicate_serial() -> None:
+    # two adapters reporting the same serial: only the port path tells them apart
+    _device = _usb_tty_device("/dev/ttyUSB0", "1-1.2")
+    _other = _usb_tty_device("/dev/ttyUSB1", "1-1.3")
+    assert usbtool.get_stable_udev_match(_device, [_device, _other]) == 'KERNELS=="1-1.2:1.0"'
+
+
+def test_render_udev_rules_and_diff(monkeypatch, tmp_path: Path) -> None:
+    _gps = _usb_tty_device("/dev/ttyUSB0", "1-1.2")
+    _plc = _usb_tty_device("/dev/ttyUSB1", "1-1.3", serial_number="FT 2")
+    monkeypatch.setattr(usbtool, "get_usb_tty_devices", lambda: [_gps, _plc])
+
+    _rules = usbtool.render_udev_rules({"plc": _plc, "gps": _gps})
+    assert _rules.splitlines() == [
+        "# generated by usbtool pin, do not edit",
+        "# gps: 0403:6011 FTDI Quad RS232-HS",
+        'SUBSYSTEM=="tty", ATTRS{idVendor}=="0403", ATTRS{idProduct}=="6011", '
+        'ATTRS{serial}=="FT1", ENV{ID_USB_INTERFACE_NUM}=="00", SYMLINK+="serial/by-name/gps"',
+        "# plc: 0403:6011 FTDI Quad RS232-HS",
+        'SUBSYSTEM=="tty", KERNELS=="1-1.3:1.0", SYMLINK+="serial/by-name/plc"',
+    ]
+
+    _rules_file = tmp_path / "99-usbtool-pinned.rules"
+    _diff = usbtool.get_udev_rules_diff(_rules, _rules_file)
+    assert _diff.startswith(f"--- {_rules_file.as_posix()}\n")
+    assert '+SUBSYSTEM=="tty", KERNELS=="1-1.3:1.0", SYMLINK+="serial/by-name/plc"\n' in _diff
+
+    _rules_file.write_text(_rules)
+    assert usbtool.get_udev_rules_diff(_rules, _rules_file) == ""
+
+    _rules_file.write_text(_rules.replace("1-1.3", "1-1.4"))
+    _diff = usbtool.get_udev_rules_diff(_rules, _rules_file)
+    assert '-SUBSYSTEM=="tty", KERNELS=="1-1.4:1.0", SYMLINK+="serial/by-name/plc"\n' in _diff
+    assert '+SUBSYSTEM=="tty", KERNELS=="1-1.3:1.0", SYMLINK+="serial/by-name/plc"\n' in _diff
+
+
+def test_create_pinned_symlinks(tmp_path: Path) -> None:
+    _directory = tmp_path / "by-name"
+    _gps = _usb_tty_device("/dev/ttyUSB0", "1-1.2")
+    _plc = _usb_tty_device("/dev/ttyUSB1", "1-1.3")
+
+    usbtool.create_pinned_symlinks({"gps": _gps, "plc": _plc}, _directory)
+    assert (_directory / "gps").readlink() == Path("/dev/ttyUSB0")
+    assert (_directory / "plc").readlink() == Path("/dev/ttyUSB1")
+
+    # plc is no longer pinned: kept by default, removed with prune
+    _gps = _usb_tty_device("/dev/ttyUSB3", "1-1.2")
+    usbtool.create_pinned_symlinks({"gps": _gps}, _directory)
+    assert (_directory / "gps").readlink() == Path("/dev/ttyUSB3")
+    assert usbtool.get_stale_pinned_symlinks({"gps": _gps}, _directory) == [_directory / "plc"]
+
+    usbtool.create_pinned_symlinks({"gps": _gps}, _directory, prune=True)
+    assert sorted(_.name for _ in _directory.iterdir()) == ["gps"]
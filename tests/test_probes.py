@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import struct
+from dataclasses import dataclass
+
+import pytest
+
+from usbtool.probes import PROBES
+from usbtool.probes import AtProbe
+from usbtool.probes import DleStxProbe
+from usbtool.probes import HexProbe
+from usbtool.probes import ModbusRtuProbe
+from usbtool.probes import Probe
+from usbtool.probes import ScpiIdnProbe
+from usbtool.probes import crc16_modbus
+from usbtool.probes import dle_stx_frame
+from usbtool.probes import dle_stx_unframe
+from usbtool.probes import make_probe
+from usbtool.probes import register_probe
+
+
+def feed_bytewise(probe: Probe, reply: bytes) -> list[bool | None]:
+    return [probe.feed(reply[:_]) for _ in range(1, len(reply) + 1)]
+
+
+def test_crc16_modbus() -> None:
+    # read 2 holding registers from address 1 at 0: 01 03 00 00 00 02 C4 0B
+    assert crc16_modbus(bytes.fromhex("010300000002")) == 0x0BC4
+    assert crc16_modbus(b"123456789") == 0x4B37
+
+
+def test_dle_stx_frame() -> None:
+    # the README example
+    assert dle_stx_frame(b"SA") == bytes.fromhex("100253411003")
+    assert dle_stx_frame(b"\x10") == bytes.fromhex("100210101003")
+
+
+def test_dle_stx_unframe() -> None:
+    _frame = dle_stx_frame(b"a\x10b\x10")
+    assert dle_stx_unframe(_frame) == b"a\x10b\x10"
+    assert dle_stx_unframe(_frame + b"trailing") == b"a\x10b\x10"
+    for _ in range(2, len(_frame)):
+        assert dle_stx_unframe(_frame[:_]) is None
+    # a trailing DLE may still become DLE ETX or DLE DLE
+    assert dle_stx_unframe(bytes.fromhex("10024110")) is None
+    # DLE followed by anything else is invalid
+    with pytest.raises(ValueError):
+        dle_stx_unframe(bytes.fromhex("10021041"))
+    with pytest.raises(ValueError):
+        dle_stx_unframe(b"SA")
+
+
+def test_hex_probe() -> None:
+    _probe = HexProbe(command_hex="100253411003", response_hex="065341")
+    assert _probe.request() == bytes.fromhex("100253411003")
+    assert feed_bytewise(_probe, b"\x06SA") == [None, None, True]
+    # the first wrong byte decides
+    assert _probe.feed(b"\x15") is False
+    assert _probe.feed(b"\x06SB") is False
+
+
+def test_modbus_rtu_probe() -> None:
+    _probe = ModbusRtuProbe(address=0x11, register=0x6B, count=3)
+    _request = _probe.request()
+    assert _request[:6] == bytes.fromhex("1103006B0003")
+    assert struct.unpack("<H", _request[6:])[0] == crc16_modbus(_request[:6])
+
+    _reply = bytes.fromhex("110306AE4156524340")
+    _reply += struct.pack("<H", crc16_modbus(_reply))
+    assert feed_bytewise(_probe, _reply) == [None] * (len(_reply) - 1) + [True]
+
+    _bad_crc = _reply[:-1] + bytes([_reply[-1] ^ 0xFF])
+    assert _probe.feed(_bad_crc) is False
+
+    _exception = bytes([0x11, 0x83, 0x02])
+    _exception += struct.pack("<H", crc16_modbus(_exception))
+    assert _probe.feed(_exception) is True
+
+    assert _probe.feed(b"\x12\x03") is False  # another address
+    assert _probe.feed(b"\x11\x04") is False  # another function
+
+
+@pytest.mark.parametrize(
+    "arguments",
+    [
+        {"address": "256"},
+        {"address": "-1"},
+        {"function": "0x100"},
+        {"register": "0x10000"},
+        {"count": "65536"},
+    ],
+)
+def test_modbus_rtu_probe_ranges(arguments: dict[str, str]) -> None:
+    with pytest.raises(ValueError, match="is not in 0.."):
+        make_probe("modbus-rtu", **arguments)
+    assert ModbusRtuProbe(address=255, function=255, register=65535, count=65535).request()
+
+
+def test_scpi_idn_probe() -> None:
+    assert ScpiIdnProbe().request() == b"*IDN?\n"
+    assert ScpiIdnProbe().feed(b"KEYSIGHT,34461A,MY1234,A.02") is None
+    assert ScpiIdnProbe().feed(b"KEYSIGHT,34461A,MY1234,A.02\n") is True
+    assert ScpiIdnProbe(pattern="34461A").feed(b"KEYSIGHT,34461A,MY1234,A.02\r\n") is True
+    assert ScpiIdnProbe(pattern="34470A").feed(b"KEYSIGHT,34461A,MY1234,A.02\n") is False
+    # a device that just prints lines is not an instrument
+    assert ScpiIdnProbe().feed(b"$GPGGA,123519,4807.038,N,01131.000,E,1,08,0.9*47\n") is False
+    assert ScpiIdnProbe().feed(b"hello\n") is False
+
+
+def test_at_probe() -> None:
+    assert AtProbe().request() == b"AT\r"
+    assert AtProbe().feed(b"AT\r\r\nOK") is None
+    assert AtProbe().feed(b"AT\r\r\nOK\r\n") is True
+    _probe = AtProbe(command="AT+CPIN?", response="+CPIN: READY")
+    assert _probe.feed(b"\r\n+CPIN: READY\r\n") is True
+    assert AtProbe().feed(b"\r\nERROR\r\n") is False
+    assert AtProbe().feed(b"\r\n+CME ERROR: 10\r\n") is False
+
+
+def test_dle_stx_probe() -> None:
+    _probe = DleStxProbe(payload_hex="5341", response_hex="065341")
+    assert _probe.request() == bytes.fromhex("100253411003")
+    # unframed ACK reply
+    assert feed_bytewise(_probe, b"\x06SA") == [None, None, True]
+    assert _probe.feed(b"\x15") is False
+
+    # framed reply, compared by payload
+    _probe = DleStxProbe(payload_hex="5341", response_hex="06105341")
+    _reply = dle_stx_frame(bytes.fromhex("06105341"))
+    assert feed_bytewise(_probe, _reply) == [None] * (len(_reply) - 1) + [True]
+    assert _probe.feed(dle_stx_frame(b"\x06SB")) is False
+    assert _probe.feed(bytes.fromhex("100210FF")) is False
+
+
+def test_make_probe_converts_arguments() -> None:
+    assert make_probe("modbus-rtu", address="0x11", count="2") == ModbusRtuProbe(
+        address=0x11,
+        count=2,
+    )
+    assert make_probe("hex", command_hex="aa", response_hex="bb") == HexProbe("aa", "bb")
+    with pytest.raises(ValueError, match="unknown probe"):
+        make_probe("nope")
+    with pytest.raises(ValueError, match="no argument"):
+        make_probe("modbus-rtu", nope="1")
+    with pytest.raises(ValueError, match="not a valid int"):
+        make_probe("modbus-rtu", address="one")
+
+
+def test_register_probe_argument_types() -> None:
+    @register_probe("test-typed")
+    @dataclass(frozen=True)
+    class TypedProbe(Probe):
+        delay: float = 0.1
+        limit: int | None = 1
+        raw: bytes = b""
+        strict: bool = False
+        extra: list | None = None
+
+        def request(self) -> bytes:
+            return b""
+
+        def feed(self, buffer: bytes) -> bool | None:
+            return None
+
+    try:
+        _probe = make_probe(
+            "test-typed",
+            delay="0.5",
+            limit="none",
+            raw="0a0b",
+            strict="yes",
+        )
+        assert _probe == TypedProbe(delay=0.5, limit=None, raw=b"\n\x0b", strict=True)
+        with pytest.raises(ValueError, match="unsupported type"):
+            make_probe("test-typed", extra="1")
+        with pytest.raises(ValueError, match="already registered"):
+            register_probe("test-typed")(TypedProbe)
+    finally:
+        del PROBES["test-typed"]
+
+
+def test_register_incomplete_probe() -> None:
+    @dataclass(frozen=True)
+    class IncompleteProbe(Probe):
+        def request(self) -> bytes:
+            return b""
+
+    with pytest.raises(TypeError):
+        IncompleteProbe()
+    with pytest.raises(ValueError, match="does not implement \\['feed'\\]"):
+        register_probe("test-incomplete")(IncompleteProbe)
+    assert "test-incomplete" not in PROBES
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from usbtool import usbtool
+
+
+def _write_attributes(path: Path, **attributes: str) -> None:
+    path.mkdir(parents=True, exist_ok=True)
+    for _name, _value in attributes.items():
+        (path / _name).write_text(f"{_value}\n")
+
+
+@pytest.fixture
+def sysfs(tmp_path: Path, monkeypatch) -> Path:
+    """
+    1-1.2: quad port FTDI, ttyUSB0 on interface 0, ttyUSB1 on interface 1
+    1-1.3: CDC ACM, ttyACM0 (the tty device link is the interface itself)
+    ttyS0: not usb
+    """
+    _usb1 = tmp_path / "devices/pci0000:00/usb1"
+    _write_attributes(
+        _usb1 / "1-1/1-1.2",
+        idVendor="0403",
+        idProduct="6011",
+        serial="FT1",
+        manufacturer="FTDI",
+        product="Quad RS232-HS",
+        busnum="1",
+        devnum="5",
+    )
+    _write_attributes(
+        _usb1 / "1-1/1-1.3",
+        idVendor="2341",
+        idProduct="0043",
+        busnum="1",
+        devnum="6",
+    )
+    _links = {
+        "ttyUSB0": _usb1 / "1-1/1-1.2/1-1.2:1.0/ttyUSB0",
+        "ttyUSB1": _usb1 / "1-1/1-1.2/1-1.2:1.1/ttyUSB1",
+        "ttyACM0": _usb1 / "1-1/1-1.3/1-1.3:1.0",
+        "ttyS0": tmp_path / "devices/platform/serial8250/ttyS0",
+    }
+    _write_attributes(_usb1 / "1-1/1-1.2/1-1.2:1.0", bInterfaceNumber="00")
+    _write_attributes(_usb1 / "1-1/1-1.2/1-1.2:1.1", bInterfaceNumber="01")
+    _write_attributes(_usb1 / "1-1/1-1.3/1-1.3:1.0", bInterfaceNumber="00")
+    for _name, _target in _links.items():
+        _target.mkdir(parents=True, exist_ok=True)
+        (tmp_path / "class/tty" / _name).mkdir(parents=True)
+        (tmp_path / "class/tty" / _name / "device").symlink_to(_target)
+
+    monkeypatch.setattr(usbtool, "SYS_CLASS_TTY", tmp_path / "class/tty")
+    usbtool.refresh()
+    yield _usb1
+    usbtool.refresh()
+
+
+def test_usb_serial_layout(sysfs: Path) -> None:
+    _ = usbtool.get_usb_tty_device(Path("/sys/bus/usb-serial/devices/ttyUSB1"))
+    assert _.device == Path("/dev/ttyUSB1")
+    assert _.usb_device == (sysfs / "1-1/1-1.2").resolve()
+    assert _.interface.name == "1-1.2:1.1"
+    assert _.interface_number == 1
+    assert _.usb_id == "0403:6011"
+    assert _.serial_number == "FT1"
+    assert _.manufacturer == "FTDI"
+    assert (_.busnum, _.devnum) == (1, 5)
+    assert _.port_path == "1-1.2"
+
+
+def test_acm_layout(sysfs: Path) -> None:
+    _ = usbtool.get_usb_tty_device(Path("/dev/ttyACM0"))
+    assert _.interface.name == "1-1.3:1.0"
+    assert _.interface_number == 0
+    assert _.usb_id == "2341:0043"
+    assert _.serial_number is None
+
+
+def test_not_usb(sysfs: Path) -> None:
+    with pytest.raises(ValueError):
+        usbtool.get_usb_tty_device(Path("/dev/ttyS0"))
+    with pytest.raises(ValueError):
+        usbtool.get_usb_tty_device(Path("/dev/ttyUSB9"))
+
+
+def test_interface_vanishes_during_unplug(sysfs: Path, monkeypatch) -> None:
+    _read_sysfs_attribute = usbtool.read_sysfs_attribute
+
+    def _unplugged(path: Path, attribute: str) -> str | None:
+        if attribute == "bInterfaceNumber":
+            return None
+        return _read_sysfs_attribute(path, attribute)
+
+    monkeypatch.setattr(usbtool, "read_sysfs_attribute", _unplugged)
+    with pytest.raises(ValueError):
+        usbtool.get_usb_tty_device(Path("/dev/ttyUSB0"))
+
+
+def test_group_devices_by_adapter(sysfs: Path) -> None:
+    _devices = [
+        usbtool.get_usb_tty_device(Path(f"/dev/{_}"))
+        for _ in ("ttyACM0", "ttyUSB1", "ttyUSB0")
+    ]
+    _adapters = usbtool.group_devices_by_adapter(_devices)
+    assert [_.name for _ in _adapters] == ["1-1.2", "1-1.3"]
+    assert [[_.device.name for _ in _ports] for _ports in _adapters.values()] == [
+        ["ttyUSB0", "ttyUSB1"],
+        ["ttyACM0"],
+    ]
+
+
+def test_find_device_skips_sibling_ports(sysfs: Path, monkeypatch) -> None:
+    _probed = []
+
+    def _probe_device(device: Path, **kwargs) -> bool:
+        _probed.append(device)
+        return True
+
+    monkeypatch.setattr(usbtool, "probe_device", _probe_device)
+    _ = usbtool.find_device(
+        baud_rate=9600,
+        command_hex="aa",
+        response_hex="bb",
+        interface_number=1,
+        devices=[Path("/dev/ttyUSB0"), Path("/dev/ttyUSB1"), Path("/dev/ttyS0")],
+    )
+    assert _ == Path("/dev/ttyUSB1")
+    assert _probed == [Path("/dev/ttyUSB1")]
@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from serial.serialutil import SerialException
+
+from usbtool import usbtool
+
+
+def test_schedule_per_hub_limits_concurrency(monkeypatch) -> None:
+    # /a* behind hub a, /b* behind hub b
+    monkeypatch.setattr(usbtool, "get_upstream_hub", lambda _: Path(f"/hub/{_.name[0]}"))
+    _devices = [Path(f"/{_hub}{_}") for _hub in "ab" for _ in range(4)]
+    _lock = threading.Lock()
+    _running: dict[str, int] = {"a": 0, "b": 0}
+    _peak: dict[str, int] = {"a": 0, "b": 0}
+
+    def _function(device: Path) -> str:
+        _hub = device.name[0]
+        with _lock:
+            _running[_hub] += 1
+            _peak[_hub] = max(_peak[_hub], _running[_hub])
+        time.sleep(0.02)
+        with _lock:
+            _running[_hub] -= 1
+        return device.name
+
+    _results = usbtool.schedule_per_hub(_devices, _function, max_per_hub=2)
+    assert _results == [_.name for _ in _devices]
+    assert _peak == {"a": 2, "b": 2}
+
+    _peak.update(a=0, b=0)
+    usbtool.schedule_per_hub(_devices, _function, max_per_hub=1)
+    assert _peak == {"a": 1, "b": 1}
+
+
+def test_schedule_per_hub_stop_event(monkeypatch) -> None:
+    monkeypatch.setattr(usbtool, "get_upstream_hub", lambda _: Path("/hub"))
+    _devices = [Path(f"/dev/ttyUSB{_}") for _ in range(5)]
+    _stop_event = threading.Event()
+
+    def _function(device: Path) -> bool:
+        if device.name == "ttyUSB1":
+            _stop_event.set()
+            return True
+        return False
+
+    _results = usbtool.schedule_per_hub(_devices, _function, stop_event=_stop_event)
+    assert _results == [False, True, None, None, None]
+
+    with pytest.raises(ValueError):
+        usbtool.schedule_per_hub(_devices, _function, max_per_hub=0)
+
+
+class FakeSystem:
+    """
+    ports: /dev path -> (usb device, interface number, busnum, devnum)
+    owners: /dev path -> the spec name whose device is plugged in there
+    """
+
+    def __init__(self, monkeypatch) -> None:
+        self.generation = 0
+        self.ports: dict[Path, tuple] = {}
+        self.owners: dict[Path, str] = {}
+        self.probed: list[Path] = []
+        # /dev path -> exception raised when it is probed (ex: unplugged mid-probe)
+        self.errors: dict[Path, Exception] = {}
+        monkeypatch.setattr(usbtool, "get_enumeration_generation", lambda: (self.generation,))
+        monkeypatch.setattr(usbtool, "get_port_identities", lambda: dict(self.ports))
+        monkeypatch.setattr(usbtool, "find_device", self.find_device)
+
+    def plug(self, device: str, name: str, devnum: int) -> None:
+        self.ports[Path(device)] = (Path(f"/sys/usb/{name}"), 0, 1, devnum)
+        self.owners[Path(device)] = name
+        self.generation += 1
+
+    def unplug(self, device: str) -> None:
+        del self.ports[Path(device)]
+        del self.owners[Path(device)]
+        self.generation += 1
+
+    def find_device(self, *, serial_number: str, devices: list[Path], **kwargs) -> Path:
+        for _ in devices:
+            self.probed.append(_)
+            if _ in self.errors:
+                raise self.errors[_]
+            if self.owners.get(_) == serial_number:
+                return _
+        raise ValueError(serial_number)
+
+
+def _events(events: list[dict]) -> list[tuple]:
+    return [(_["event"], _["name"], _["device"], _["previous_device"]) for _ in events]
+
+
+def test_device_watcher(monkeypatch) -> None:
+    _system = FakeSystem(monkeypatch)
+    _system.plug("/dev/ttyUSB0", "gps", devnum=5)
+    _system.plug("/dev/ttyUSB1", "plc", devnum=6)
+    _watcher = usbtool.DeviceWatcher(
+        {
+            "gps": {"serial_number": "gps"},
+            "plc": {"serial_number": "plc"},
+        }
+    )
+
+    assert _events(_watcher.poll()) == [
+        ("found", "gps", "/dev/ttyUSB0", None),
+        ("found", "plc", "/dev/ttyUSB1", None),
+    ]
+    # nothing changed: no probes at all
+    _system.probed.clear()
+    assert _watcher.poll() == []
+    assert _system.probed == []
+
+    # unplug both, replug plc: it is renumbered to ttyUSB0
+    _system.unplug("/dev/ttyUSB0")
+    _system.unplug("/dev/ttyUSB1")
+    _system.plug("/dev/ttyUSB0", "plc", devnum=7)
+    assert _events(_watcher.poll()) == [
+        ("lost", "gps", None, "/dev/ttyUSB0"),
+        ("moved", "plc", "/dev/ttyUSB0", "/dev/ttyUSB1"),
+    ]
+    assert _watcher.mapping == {"gps": None, "plc": Path("/dev/ttyUSB0")}
+
+    # a new port only probes the new port
+    _system.probed.clear()
+    _system.plug("/dev/ttyUSB1", "gps", devnum=8)
+    assert _events(_watcher.poll()) == [("found", "gps", "/dev/ttyUSB1", None)]
+    assert set(_system.probed) == {Path("/dev/ttyUSB1")}
+
+
+@pytest.mark.parametrize(
+    "error",
+    [SerialException("device reports readiness to read but returned no data"), OSError(5, "EIO")],
+)
+def test_device_watcher_survives_port_errors(monkeypatch, error: Exception) -> None:
+    _system = FakeSystem(monkeypatch)
+    _system.plug("/dev/ttyUSB0", "gps", devnum=5)
+    _watcher = usbtool.DeviceWatcher({"gps": {"serial_number": "gps"}})
+    assert _events(_watcher.poll()) == [("found", "gps", "/dev/ttyUSB0", None)]
+
+    # replugged and yanked again while the verification probe is running
+    _system.unplug("/dev/ttyUSB0")
+    _system.plug("/dev/ttyUSB0", "gps", devnum=6)
+    _system.errors[Path("/dev/ttyUSB0")] = error
+    assert _events(_watcher.poll()) == [("lost", "gps", None, "/dev/ttyUSB0")]
+
+    # a new port erroring during the search is not a match either
+    _system.plug("/dev/ttyUSB1", "plc", devnum=7)
+    assert _watcher.poll() == []
+
+    _system.unplug("/dev/ttyUSB0")
+    del _system.errors[Path("/dev/ttyUSB0")]
+    _system.plug("/dev/ttyUSB2", "gps", devnum=8)
+    _events_seen = []
+    _stop_event = threading.Event()
+
+    def _callback(event: dict) -> None:
+        _events_seen.append(event)
+        _stop_event.set()
+
+    _watcher.run(_callback, poll_interval=0, stop_event=_stop_event)
+    assert _events(_events_seen) == [("found", "gps", "/dev/ttyUSB2", None)]
+
+
+def _usb_tty_device(
+    device: str,
+    devnum: int,
+    serial_number: str = "FT1",
+) -> usbtool.UsbTtyDevice:
+    return usbtool.UsbTtyDevice(
+        device=Path(device),
+        usb_device=Path(f"/sys/devices/usb1/1-1.{devnum}"),
+        interface=Path(f"/sys/devices/usb1/1-1.{devnum}/1-1.{devnum}:1.0"),
+        interface_number=0,
+        usb_id="0403:6001",
+        serial_number=serial_number,
+        manufacturer="FTDI",
+        product="FT232R",
+        busnum=1,
+        devnum=devnum,
+    )
+
+
+def test_inventory(monkeypatch, tmp_path: Path) -> None:
+    _live = [_usb_tty_device("/dev/ttyUSB0", 5), _usb_tty_device("/dev/ttyUSB1", 6, "FT2")]
+    monkeypatch.setattr(usbtool, "get_usb_tty_devices", lambda: list(_live))
+    monkeypatch.setattr(usbtool, "find_device", lambda **kwargs: Path("/dev/ttyUSB1"))
+
+    _inventory = usbtool.get_inventory_snapshot({"plc": "plc:command_hex=aa,response_hex=bb"})
+    usbtool.save_inventory(_inventory, tmp_path / "inventory.json")
+    _inventory = usbtool.load_inventory(tmp_path / "inventory.json")
+    assert usbtool.diff_inventory(_inventory) == {"added": [], "removed": [], "changed": []}
+
+    _probe = usbtool.HexProbe(command_hex="aa", response_hex="bb")
+    assert usbtool.find_device_in_inventory(_inventory, name="plc") == Path("/dev/ttyUSB1")
+    assert usbtool.find_device_in_inventory(_inventory, probe=_probe, baud_rate=9600) == Path(
+        "/dev/ttyUSB1"
+    )
+    assert usbtool.find_device_in_inventory(_inventory, probe=_probe, baud_rate=115200) is None
+    assert usbtool.find_device_in_inventory(_inventory, serial_number="FT1") == Path("/dev/ttyUSB0")
+    with pytest.raises(ValueError, match="required"):
+        usbtool.find_device_in_inventory(_inventory)
+    # same criteria as find_device(): --interface alone is rejected
+    with pytest.raises(ValueError, match="required"):
+        usbtool.find_device_in_inventory(_inventory, interface_number=0)
+    assert usbtool.find_device_in_inventory(
+        _inventory, serial_number="FT1", interface_number=0
+    ) == Path("/dev/ttyUSB0")
+    assert usbtool.find_device_in_inventory(_inventory, serial_number="FT1", interface_number=1) is None
+
+    # replug of ttyUSB1 (new devnum) and a new port that could also match FT1
+    _live = [
+        _usb_tty_device("/dev/ttyUSB0", 5),
+        _usb_tty_device("/dev/ttyUSB1", 9, "FT2"),
+        _usb_tty_device("/dev/ttyUSB2", 7),
+    ]
+    assert usbtool.diff_inventory(_inventory) == {
+        "added": ["/dev/ttyUSB2"],
+        "removed": [],
+        "changed": ["/dev/ttyUSB1"],
+    }
+    assert usbtool.find_device_in_inventory(_inventory, name="plc") is None
+    assert usbtool.find_device_in_inventory(_inventory, serial_number="FT1") is None
+    assert usbtool.find_device_in_inventory(_inventory, serial_number="FT3") is None
+
+    _live = []
+    assert usbtool.diff_inventory(_inventory)["removed"] == ["/dev/ttyUSB0", "/dev/ttyUSB1"]
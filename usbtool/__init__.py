@@ -9,3 +9,24 @@ from .usbtool import get_usb_id_for_device as get_usb_id_for_device
 from .usbtool import get_serial_number_for_device as get_serial_number_for_device
 from .usbtool import get_devices_for_usb_id as get_devices_for_usb_id
 from .usbtool import find_device as find_device
+from .usbtool import refresh as refresh
+from .usbtool import get_usb_tty_device as get_usb_tty_device
+from .usbtool import get_usb_tty_devices as get_usb_tty_devices
+from .usbtool import group_devices_by_adapter as group_devices_by_adapter
+from .usbtool import get_pinned_device as get_pinned_device
+from .usbtool import DeviceWatcher as DeviceWatcher
+from .probes import Probe as Probe
+from .probes import register_probe as register_probe
+from .probes import make_probe as make_probe
+from .probes import HexProbe as HexProbe
+from .probes import ModbusRtuProbe as ModbusRtuProbe
+from .probes import ScpiIdnProbe as ScpiIdnProbe
+from .probes import AtProbe as AtProbe
+from .probes import DleStxProbe as DleStxProbe
+from .usbtool import get_inventory_snapshot as get_inventory_snapshot
+from .usbtool import save_inventory as save_inventory
+from .usbtool import load_inventory as load_inventory
+from .usbtool import diff_inventory as diff_inventory
+from .usbtool import find_device_in_inventory as find_device_in_inventory
+from .usbtool import benchmark_ports as benchmark_ports
+from .capture import SerialCapture as SerialCapture
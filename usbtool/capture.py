@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+# tab-width:4
+
+"""
+Compact append-only capture of serial probe traffic.
+
+file:   header, then records until EOF
+header: MAGIC, version u16, wall clock ns u64, monotonic ns u64 (both taken at session start)
+record: monotonic ns u64, kind u8, port id u16, length u32, payload
+        kind PORT declares the port path (utf8 payload) for a port id before its first TX/RX record
+"""
+
+from __future__ import annotations
+
+import os
+import queue
+import struct
+import threading
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+
+MAGIC = b"USBTCAP\x00"
+VERSION = 1
+HEADER = struct.Struct("<8sHQQ")
+RECORD = struct.Struct("<QBHI")
+
+KIND_PORT = 0
+KIND_TX = 1
+KIND_RX = 2
+DIRECTIONS = {KIND_TX: "tx", KIND_RX: "rx"}
+
+_STOP = object()
+
+
+@dataclass(frozen=True)
+class CaptureRecord:
+    timestamp: float  # wall clock seconds
+    port: str
+    direction: str  # "tx" or "rx"
+    data: bytes
+
+
+class SerialCapture:
+    """
+    One capture file per session. tx()/rx() only enqueue, a background
+    thread does the encoding and the (buffered) file writes.
+    """
+
+    def __init__(self, data_dir: Path):
+        self.path = data_dir / f"capture_{time.time_ns()}_{os.getpid()}.usbcap"
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._port_ids: dict[str, int] = {}
+        self._port_ids_lock = threading.Lock()
+        self._error: BaseException | None = None
+        self._file = self.path.open("xb", buffering=1024 * 1024)
+        self._file.write(HEADER.pack(MAGIC, VERSION, time.time_ns(), time.monotonic_ns()))
+        self._thread = threading.Thread(
+            target=self._writer,
+            name=f"SerialCapture {self.path.name}",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def _check_writer(self) -> None:
+        # a dead writer drains nothing, so records would pile up in the queue
+        if not self._thread.is_alive():
+            if self._error is not None:
+                raise OSError(f"writing capture {self.path} failed") from self._error
+            raise OSError(f"capture {self.path} is closed")
+
+    def port_id(self, port: str) -> int:
+        self._check_writer()
+        with self._port_ids_lock:
+            try:
+                return self._port_ids[port]
+            except KeyError:
+                pass
+            _id = len(self._port_ids)
+            self._port_ids[port] = _id
+            self._queue.put((time.monotonic_ns(), KIND_PORT, _id, port.encode("utf8")))
+            return _id
+
+    def tx(self, port_id: int, data: bytes, timestamp: int | None = None) -> None:
+        # pass timestamp=time.monotonic_ns() taken before the write, flush() blocks for the wire time
+        if timestamp is None:
+            timestamp = time.monotonic_ns()
+        self._check_writer()
+        self._queue.put((timestamp, KIND_TX, port_id, bytes(data)))
+
+    def rx(self, port_id: int, data: bytes, timestamp: int | None = None) -> None:
+        if timestamp is None:
+            timestamp = time.monotonic_ns()
+        self._check_writer()
+        self._queue.put((timestamp, KIND_RX, port_id, bytes(data)))
+
+    def _writer(self) -> None:
+        _file = self._file
+        try:
+            while True:
+                _record = self._queue.get()
+                while _record is not _STOP:
+                    _timestamp, _kind, _port_id, _data = _record
+                    _file.write(RECORD.pack(_timestamp, _kind, _port_id, len(_data)))
+                    _file.write(_data)
+                    try:
+                        _record = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                # the queue drained, so this is not the hot path anymore
+                _file.flush()
+                if _record is _STOP:
+                    return
+        except BaseException as e:
+            # reported by close()
+            self._error = e
+        finally:
+            try:
+                _file.close()
+            except BaseException as e:
+                if self._error is None:
+                    self._error = e
+
+    def close(self) -> None:
+        """
+        wait for queued records to be written, raises the writer thread's error (ex: disk full)
+        """
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        if self._error is not None:
+            _error = self._error
+            self._error = None
+            raise OSError(f"writing capture {self.path} failed") from _error
+
+    def __enter__(self) -> SerialCapture:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def read_capture(path: Path) -> Iterator[CaptureRecord]:
+    with path.open("rb") as _file:
+        _header = _file.read(HEADER.size)
+        if len(_header) != HEADER.size:
+            raise ValueError(f"{path} is too short to be a capture file")
+        _magic, _version, _wall_ns, _monotonic_ns = HEADER.unpack(_header)
+        if _magic != MAGIC:
+            raise ValueError(f"{path} is not a capture file")
+        if _version != VERSION:
+            raise ValueError(f"{path} has unsupported capture version {_version}")
+
+        _ports: dict[int, str] = {}
+        while True:
+            _record = _file.read(RECORD.size)
+            if not _record:
+                return
+            if len(_record) != RECORD.size:
+                raise ValueError(f"{path} is truncated")
+            _timestamp, _kind, _port_id, _length = RECORD.unpack(_record)
+            _data = _file.read(_length)
+            if len(_data) != _length:
+                raise ValueError(f"{path} is truncated")
+            if _kind == KIND_PORT:
+                _ports[_port_id] = _data.decode("utf8")
+                continue
+            if _kind not in DIRECTIONS:
+                raise ValueError(f"{path} is corrupt, unknown record kind {_kind}")
+            if _port_id not in _ports:
+                raise ValueError(f"{path} is corrupt, port id {_port_id} was not declared")
+            yield CaptureRecord(
+                timestamp=(_wall_ns + _timestamp - _monotonic_ns) / 1e9,
+                port=_ports[_port_id],
+                direction=DIRECTIONS[_kind],
+                data=_data,
+            )
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+# tab-width:4
+
+"""
+Protocol probes for find_device().
+
+A probe builds the request to send and judges the reply as it arrives:
+feed() is called with everything read so far and returns True (match),
+False (definitely not a match) or None (need more bytes), so a probe
+ends the instant a full frame (or the first wrong byte) arrives.
+Probes are immutable and may be shared by probes running in parallel.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import inspect
+import re
+import struct
+import types
+import typing
+from abc import ABC
+from abc import abstractmethod
+from dataclasses import dataclass
+
+DLE = 0x10
+STX = 0x02
+ETX = 0x03
+
+PROBES: dict[str, type[Probe]] = {}
+
+
+def _parse_bool(value: str) -> bool:
+    if value.lower() in ("1", "true", "yes", "on"):
+        return True
+    if value.lower() in ("0", "false", "no", "off"):
+        return False
+    raise ValueError(f"{value=} is not a boolean")
+
+
+# make_probe() converts string arguments (cli, device specs) by field type
+ARGUMENT_TYPES = {
+    int: lambda _: int(_, 0),
+    float: float,
+    str: str,
+    bytes: bytes.fromhex,
+    bool: _parse_bool,
+}
+
+
+def convert_probe_argument(name: str, argument_type, value: str):
+    if (
+        isinstance(argument_type, types.UnionType)
+        or typing.get_origin(argument_type) is typing.Union
+    ):
+        # X | None: "none" (or "") gives None
+        _types = [_ for _ in typing.get_args(argument_type) if _ is not type(None)]
+        if len(_types) != 1:
+            raise ValueError(
+                f"probe argument {name=} has unsupported type {argument_type}"
+            )
+        if value.lower() in ("", "none"):
+            return None
+        argument_type = _types[0]
+    try:
+        _convert = ARGUMENT_TYPES[argument_type]
+    except KeyError:
+        _supported = [_.__name__ for _ in ARGUMENT_TYPES]
+        raise ValueError(
+            f"probe argument {name=} has unsupported type {argument_type}, expected one of {_supported}"
+        )
+    try:
+        return _convert(value)
+    except ValueError as e:
+        raise ValueError(
+            f"probe argument {name=} {value=} is not a valid {argument_type.__name__}"
+        ) from e
+
+
+def register_probe(name: str):
+    def _register(cls: type[Probe]) -> type[Probe]:
+        if name in PROBES:
+            raise ValueError(f"probe {name=} is already registered")
+        if inspect.isabstract(cls):
+            raise ValueError(
+                f"probe {name=} does not implement {sorted(cls.__abstractmethods__)}"
+            )
+        PROBES[name] = cls
+        return cls
+
+    return _register
+
+
+def make_probe(name: str, **arguments: str) -> Probe:
+    try:
+        cls = PROBES[name]
+    except KeyError:
+        raise ValueError(f"unknown probe {name=}, expected one of {sorted(PROBES)}")
+    _fields = {_.name for _ in dataclasses.fields(cls) if _.init}
+    try:
+        _types = typing.get_type_hints(cls)
+    except NameError as e:
+        raise ValueError(f"probe {name=} has field annotations that can not be resolved") from e
+    kwargs = {}
+    for _key, _value in arguments.items():
+        if _key not in _fields:
+            raise ValueError(
+                f"probe {name=} has no argument {_key=}, expected one of {sorted(_fields)}"
+            )
+        kwargs[_key] = convert_probe_argument(_key, _types[_key], _value)
+    return cls(**kwargs)
+
+
+def parse_probe_arguments(arguments: tuple[str, ...] | list[str]) -> dict[str, str]:
+    parsed = {}
+    for _ in arguments:
+        try:
+            _key, _value = _.split("=", 1)
+        except ValueError:
+            raise ValueError(f"probe argument {_=} must look like key=value")
+        parsed[_key.strip()] = _value.strip()
+    return parsed
+
+
+def crc16_modbus(data: bytes) -> int:
+    crc = 0xFFFF
+    for _byte in data:
+        crc ^= _byte
+        for _ in range(8):
+            if crc & 1:
+                crc = (crc >> 1) ^ 0xA001
+            else:
+                crc >>= 1
+    return crc
+
+
+def dle_stx_frame(payload: bytes) -> bytes:
+    _stuffed = payload.replace(bytes([DLE]), bytes([DLE, DLE]))
+    return bytes([DLE, STX]) + _stuffed + bytes([DLE, ETX])
+
+
+def dle_stx_unframe(buffer: bytes) -> bytes | None:
+    """
+    payload of the complete frame at the start of buffer, None if it is incomplete
+    """
+    if buffer[:2] != bytes([DLE, STX]):
+        raise ValueError(f"{buffer=} does not start with DLE STX")
+    payload = bytearray()
+    _index = 2
+    while _index + 1 < len(buffer):
+        _byte = buffer[_index]
+        if _byte != DLE:
+            payload.append(_byte)
+            _index += 1
+            continue
+        _next = buffer[_index + 1]
+        if _next == ETX:
+            return bytes(payload)
+        if _next != DLE:
+            raise ValueError(f"{buffer=} has an invalid DLE escape at {_index}")
+        payload.append(DLE)
+        _index += 2
+    return None
+
+
+class Probe(ABC):
+    @abstractmethod
+    def request(self) -> bytes: ...
+
+    @abstractmethod
+    def feed(self, buffer: bytes) -> bool | None: ...
+
+
+def _match_prefix(buffer: bytes, expected: bytes) -> bool | None:
+    if buffer[: len(expected)] != expected[: len(buffer)]:
+        return False
+    if len(buffer) >= len(expected):
+        return True
+    return None
+
+
+@register_probe("hex")
+@dataclass(frozen=True)
+class HexProbe(Probe):
+    """
+    the static command_hex/response_hex pair
+    """
+
+    command_hex: str
+    response_hex: str
+
+    def request(self) -> bytes:
+        return bytes.fromhex(self.command_hex)
+
+    def feed(self, buffer: bytes) -> bool | None:
+        return _match_prefix(buffer, bytes.fromhex(self.response_hex))
+
+
+@register_probe("modbus-rtu")
+@dataclass(frozen=True)
+class ModbusRtuProbe(Probe):
+    """
+    read holding registers (function 3) by default. Any well formed reply
+    from address, including an exception reply, identifies the device.
+    """
+
+    address: int = 1
+    function: int = 3
+    register: int = 0
+    count: int = 1
+
+    def __post_init__(self) -> None:
+        # struct.pack() in request() would fail later with struct.error
+        for _name, _maximum in (
+            ("address", 0xFF),
+            ("function", 0xFF),
+            ("register", 0xFFFF),
+            ("count", 0xFFFF),
+        ):
+            _value = getattr(self, _name)
+            if not 0 <= _value <= _maximum:
+                raise ValueError(f"modbus-rtu {_name}={_value} is not in 0..{_maximum}")
+
+    def request(self) -> bytes:
+        _pdu = struct.pack(">BBHH", self.address, self.function, self.register, self.count)
+        return _pdu + struct.pack("<H", crc16_modbus(_pdu))
+
+    def feed(self, buffer: bytes) -> bool | None:
+        if len(buffer) < 2:
+            return None
+        if buffer[0] != self.address:
+            return False
+        if buffer[1] == self.function | 0x80:
+            _length = 5
+        elif buffer[1] != self.function:
+            return False
+        elif self.function in (1, 2, 3, 4):
+            if len(buffer) < 3:
+                return None
+            _length = 3 + buffer[2] + 2
+        else:
+            # write functions echo address/value or address/quantity
+            _length = 8
+        if len(buffer) < _length:
+            return None
+        _frame = buffer[:_length]
+        return struct.unpack("<H", _frame[-2:])[0] == crc16_modbus(_frame[:-2])
+
+
+@register_probe("scpi-idn")
+@dataclass(frozen=True)
+class ScpiIdnProbe(Probe):
+    """
+    *IDN? and a regex searched in the first reply line. The line must have the
+    IEEE 488.2 *IDN? shape (manufacturer,model,serial,firmware) so a device
+    that just prints lines (ex: NMEA from a GPS) does not match pattern "".
+    """
+
+    pattern: str = ""
+
+    def request(self) -> bytes:
+        return b"*IDN?\n"
+
+    def feed(self, buffer: bytes) -> bool | None:
+        if b"\n" not in buffer:
+            return None
+        _line = buffer.split(b"\n", 1)[0].decode("utf8", errors="replace").strip()
+        if len(_line.split(",")) != 4:
+            return False
+        return re.search(self.pattern, _line) is not None
+
+
+@register_probe("at")
+@dataclass(frozen=True)
+class AtProbe(Probe):
+    """
+    Hayes AT command, the modem may echo the command before the result line
+    """
+
+    command: str = "AT"
+    response: str = "OK"
+
+    def request(self) -> bytes:
+        return f"{self.command}\r".encode("ascii")
+
+    def feed(self, buffer: bytes) -> bool | None:
+        _lines = buffer.decode("ascii", errors="replace").replace("\r", "\n").split("\n")
+        # the last item is an unterminated line
+        for _line in _lines[:-1]:
+            _line = _line.strip()
+            if _line == self.response:
+                return True
+            if _line == "ERROR" or _line.startswith("+CME ERROR"):
+                return False
+        return None
+
+
+@register_probe("dle-stx")
+@dataclass(frozen=True)
+class DleStxProbe(Probe):
+    """
+    DLE/STX framed binary: payload_hex is sent DLE stuffed between DLE STX and DLE ETX.
+    response_hex is compared to the payload of a framed reply, or to the raw
+    reply when the device answers unframed (ex: ACK 'S' 'A' -> 065341).
+    """
+
+    payload_hex: str
+    response_hex: str
+
+    def request(self) -> bytes:
+        return dle_stx_frame(bytes.fromhex(self.payload_hex))
+
+    def feed(self, buffer: bytes) -> bool | None:
+        _expected = bytes.fromhex(self.response_hex)
+        if buffer[:2] != bytes([DLE, STX])[: len(buffer)] or _expected[:2] == bytes([DLE, STX]):
+            return _match_prefix(buffer, _expected)
+        if len(buffer) < 2:
+            return None
+        try:
+            _payload = dle_stx_unframe(buffer)
+        except ValueError:
+            return False
+        if _payload is None:
+            return None
+        return _payload == _expected
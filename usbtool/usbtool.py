@@ -5,9 +5,22 @@
 
 from __future__ import annotations
 
+import contextlib
+import copy
+import dataclasses
+import difflib
+import functools
+import inspect
+import json
 import logging
+import math
 import os
+import re
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
 from signal import SIG_DFL
 from signal import SIGPIPE
@@ -30,12 +43,135 @@ from serialtool import SerialMinimal
 from timetool import get_year_month_day
 from serial.serialutil import SerialException
 
+from .capture import SerialCapture
+from .capture import read_capture
+from .probes import HexProbe
+from .probes import Probe
+from .probes import make_probe
+from .probes import parse_probe_arguments
+
 signal(SIGPIPE, SIG_DFL)
 
 DATA_DIR = Path(os.path.expanduser("~")) / Path(".usbtool") / Path(get_year_month_day())
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 
+SYS_CLASS_TTY = Path("/sys/class/tty")
+
+# Directories whose mtime (or listing) changes when a usb/tty device is added or removed.
+ENUMERATION_WATCH_PATHS = (
+    Path("/sys/bus/usb/devices"),
+    Path("/sys/bus/usb-serial/devices"),
+    SYS_CLASS_TTY,
+    Path("/dev"),
+)
+
+PINNED_DEVICE_DIR = Path("/dev/serial/by-name")
+UDEV_RULES_FILE = Path("/etc/udev/rules.d/99-usbtool-pinned.rules")
+# spec names and serial numbers end up unescaped in udev rule strings, where
+# whitespace separates SYMLINK names, '"' ends the string, $ and % are
+# substituted and *?[ are globs
+UDEV_SAFE_VALUE = re.compile(r"[A-Za-z0-9._-]+")
+INVENTORY_FILE = DATA_DIR.parent / "inventory.json"
+INVENTORY_VERSION = 1
+
+# keys a device spec may set, and the find_device() keyword they map to
+DEVICE_SPEC_KEYS = {
+    "command_hex": str,
+    "response_hex": str,
+    "probe": str,
+    "usb_id": str,
+    "serial_number": str,
+    "manufacturer": str,
+    "interface_number": int,
+    "baud_rate": int,
+    "timeout": float,
+    "tries": int,
+    "retry_delay": float,
+    "max_probes_per_hub": int,
+}
+
+_enumeration_cache: dict[tuple, object] = {}
+_enumeration_cache_generation: tuple | None = None
+_enumeration_cache_lock = threading.RLock()
+# generation pinned for the duration of the outermost cached call (per thread)
+_enumeration_cache_local = threading.local()
+
+
+def get_enumeration_generation() -> tuple:
+    # stat() and listdir() on sysfs/devtmpfs cost microseconds, unlike the
+    # udevadm/lsusb forks the cached functions below would otherwise repeat.
+    # sysfs directory mtimes are not reliably bumped on hotplug, so the
+    # entry names are part of the generation as well.
+    _generation = []
+    for _path in ENUMERATION_WATCH_PATHS:
+        try:
+            _generation.append(_path.stat().st_mtime_ns)
+            _generation.append(frozenset(os.listdir(_path)))
+        except FileNotFoundError:
+            _generation.append(None)
+            _generation.append(None)
+    return tuple(_generation)
+
+
+@contextlib.contextmanager
+def pinned_enumeration_generation():
+    """
+    Check the generation once for the whole block: cached calls made inside
+    it (including nested ones, ex: get_usb_tty_devices() -> get_usb_tty_device()
+    per port) are plain dict lookups instead of repeating the stat()/listdir().
+    """
+    _generation = getattr(_enumeration_cache_local, "generation", None)
+    if _generation is not None:
+        yield _generation
+        return
+    _enumeration_cache_local.generation = get_enumeration_generation()
+    try:
+        yield _enumeration_cache_local.generation
+    finally:
+        _enumeration_cache_local.generation = None
+
+
+def refresh() -> None:
+    global _enumeration_cache_generation
+    with _enumeration_cache_lock:
+        _enumeration_cache.clear()
+        _enumeration_cache_generation = None
+
 
+def enumeration_cache(function):
+    """
+    Memoize function(...) until the usb/tty device set changes.
+    Exceptions are not cached. Mutable results are copied on return
+    so callers can not corrupt the cache.
+    """
+    _signature = inspect.signature(function)
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        global _enumeration_cache_generation
+        # f(x) and f(usb_id=x) are the same call, and share a cache entry
+        _bound = _signature.bind(*args, **kwargs)
+        _bound.apply_defaults()
+        _key = (function.__name__,) + tuple(_bound.arguments.items())
+        with pinned_enumeration_generation() as _generation:
+            with _enumeration_cache_lock:
+                if _generation != _enumeration_cache_generation:
+                    _enumeration_cache.clear()
+                    _enumeration_cache_generation = _generation
+                try:
+                    return copy.copy(_enumeration_cache[_key])
+                except KeyError:
+                    pass
+            _ = function(*_bound.args, **_bound.kwargs)
+            with _enumeration_cache_lock:
+                if _generation == _enumeration_cache_generation:
+                    _enumeration_cache[_key] = _
+            return copy.copy(_)
+
+    return wrapper
+
+
+@enumeration_cache
 def get_attributes(device: Path) -> str:
     try:
         _ = sh.udevadm("info", "--attribute-walk", device.as_posix())
@@ -67,6 +203,7 @@ def get_manufacturer_for_device(device: Path) -> str:
     raise ValueError(device)
 
 
+@enumeration_cache
 def get_usb_id_dict():
     ids = {}
     _ = sh.lsusb()
@@ -78,6 +215,7 @@ def get_usb_id_dict():
     return ids
 
 
+@enumeration_cache
 def get_usb_tty_device_list() -> list[Path]:
     _bus_path = Path("/sys/bus/usb-serial/devices/")
     _device_list = [Path(_) for _ in _bus_path.iterdir()]
@@ -111,6 +249,98 @@ def get_devices() -> list[Path]:
     return _devices
 
 
+@dataclass(frozen=True)
+class UsbTtyDevice:
+    device: Path  # /dev/ttyUSB0
+    usb_device: Path  # /sys/devices/.../1-1.2 (the physical adapter)
+    interface: Path  # /sys/devices/.../1-1.2:1.0
+    interface_number: int
+    usb_id: str
+    serial_number: str | None
+    manufacturer: str | None
+    product: str | None
+    busnum: int
+    devnum: int
+
+    @property
+    def port_path(self) -> str:
+        return self.usb_device.name
+
+
+def read_sysfs_attribute(path: Path, attribute: str) -> str | None:
+    try:
+        return (path / attribute).read_text().strip()
+    except OSError:
+        return None
+
+
+@enumeration_cache
+def get_usb_tty_device(device: Path) -> UsbTtyDevice:
+    # /sys/class/tty/ttyUSB0/device is the usb-serial port below the usb interface,
+    # /sys/class/tty/ttyACM0/device is the usb interface itself.
+    _sys_device = (SYS_CLASS_TTY / device.name / "device").resolve()
+    # read, not exists(): the attribute can vanish in between during an unplug
+    for _interface in (_sys_device, *_sys_device.parents):
+        _interface_number = read_sysfs_attribute(_interface, "bInterfaceNumber")
+        if _interface_number is not None:
+            break
+    else:
+        raise ValueError(device)
+
+    _usb_device = _interface.parent
+    _id_vendor = read_sysfs_attribute(_usb_device, "idVendor")
+    _id_product = read_sysfs_attribute(_usb_device, "idProduct")
+    if not (_id_vendor and _id_product):
+        raise ValueError(device)
+
+    return UsbTtyDevice(
+        device=Path(f"/dev/{device.name}"),
+        usb_device=_usb_device,
+        interface=_interface,
+        interface_number=int(_interface_number, 16),
+        usb_id=f"{_id_vendor}:{_id_product}",
+        serial_number=read_sysfs_attribute(_usb_device, "serial"),
+        manufacturer=read_sysfs_attribute(_usb_device, "manufacturer"),
+        product=read_sysfs_attribute(_usb_device, "product"),
+        busnum=int(read_sysfs_attribute(_usb_device, "busnum") or 0),
+        devnum=int(read_sysfs_attribute(_usb_device, "devnum") or 0),
+    )
+
+
+@enumeration_cache
+def get_usb_tty_devices() -> list[UsbTtyDevice]:
+    _devices = []
+    for _ in get_usb_tty_device_list():
+        try:
+            _devices.append(get_usb_tty_device(_))
+        except ValueError as e:
+            ic(e)
+    _devices.sort(key=lambda _: (_.usb_device, _.interface_number))
+    return _devices
+
+
+def group_devices_by_adapter(
+    devices: list[UsbTtyDevice],
+) -> dict[Path, list[UsbTtyDevice]]:
+    adapters: dict[Path, list[UsbTtyDevice]] = {}
+    for _ in sorted(devices, key=lambda _: (_.usb_device, _.interface_number)):
+        adapters.setdefault(_.usb_device, []).append(_)
+    return adapters
+
+
+def sort_devices_by_adapter(devices: list[Path]) -> list[Path]:
+    # siblings on one multi-port adapter end up next to each other, in interface order
+    def _key(device: Path):
+        try:
+            _ = get_usb_tty_device(device)
+        except ValueError:
+            return (1, Path(), 0, device)
+        return (0, _.usb_device, _.interface_number, device)
+
+    return sorted(devices, key=_key)
+
+
+@enumeration_cache
 def get_devices_for_usb_id(usb_id) -> list[Path]:
     devices = []
     assert len(usb_id) == 9
@@ -124,37 +354,235 @@ def get_devices_for_usb_id(usb_id) -> list[Path]:
             devices.append(Path(f"/dev/{_.name}"))
 
     if devices:
-        return devices
+        return sort_devices_by_adapter(devices)
     raise ValueError(usb_id)
 
 
+def read_probe_reply(
+    ser,
+    probe: Probe,
+    *,
+    timeout: float,
+    on_chunk=None,
+) -> tuple[bool | None, bytes, float | None]:
+    """
+    -> (verdict, bytes read, time.monotonic() the first byte arrived)
+    Feed the probe whatever has arrived so it can decide as soon as a
+    full frame (or the first wrong byte) is in, instead of waiting out the timeout.
+    """
+    _deadline = time.monotonic() + timeout
+    _bytes_read = b""
+    _first_byte_time = None
+    _verdict = None
+    while _verdict is None:
+        _remaining = _deadline - time.monotonic()
+        if _remaining <= 0:
+            break
+        ser.timeout = _remaining
+        _chunk = ser.read(max(1, ser.in_waiting))
+        if not _chunk:
+            break
+        if _first_byte_time is None:
+            _first_byte_time = time.monotonic()
+        if on_chunk:
+            on_chunk(_chunk)
+        _bytes_read += _chunk
+        _verdict = probe.feed(_bytes_read)
+    return _verdict, _bytes_read, _first_byte_time
+
+
+def probe_device(
+    device: Path,
+    *,
+    probe: Probe,
+    baud_rate: int,
+    timeout: float,
+    data_dir: Path = DATA_DIR,
+    capture: SerialCapture | None = None,
+) -> bool:
+    try:
+        serial_oracle = SerialMinimal(
+            data_dir=data_dir,
+            log_serial_data=False,
+            serial_port=device.as_posix(),
+            baud_rate=baud_rate,
+            default_timeout=timeout,
+        )
+    except PermissionError as e:
+        ic(e)
+        eprint(
+            f"ERROR: PermissionError on port {device.as_posix()} (Skipped searching this port)"
+        )
+        return False
+    except SerialException as e:
+        ic(e)
+        eprint(
+            f"ERROR: SerialException on port {device.as_posix()} (Skipped searching this port, likely in use)"
+        )
+        return False
+
+    if capture:
+        _port_id = capture.port_id(device.as_posix())
+    try:
+        # Flush stale bytes left over from prior probes / device boot chatter
+        try:
+            serial_oracle.ser.reset_input_buffer()
+            serial_oracle.ser.reset_output_buffer()
+        except Exception as e:
+            ic(e)
+
+        _tx_bytes = probe.request()
+        _tx_time = time.monotonic_ns()
+        _bytes_written = serial_oracle.ser.write(_tx_bytes)
+        serial_oracle.ser.flush()
+        if capture:
+            capture.tx(_port_id, _tx_bytes, timestamp=_tx_time)
+        assert _bytes_written == len(_tx_bytes)
+        eprint(f"{_tx_bytes=}")
+
+        _verdict, _bytes_read, _first_byte_time = read_probe_reply(
+            serial_oracle.ser,
+            probe,
+            timeout=timeout,
+            on_chunk=(lambda _chunk: capture.rx(_port_id, _chunk)) if capture else None,
+        )
+        eprint(f"{_bytes_read=}", f"{probe=}", f"{_verdict=}")
+        return _verdict is True
+    finally:
+        try:
+            serial_oracle.ser.close()
+        except Exception as e:
+            ic(e)
+
+
+def get_upstream_hub(device: Path) -> Path | None:
+    try:
+        return get_usb_tty_device(device).usb_device.parent
+    except ValueError:
+        return None
+
+
+def group_devices_by_hub(devices: list[Path]) -> dict[Path | None, list[Path]]:
+    hubs: dict[Path | None, list[Path]] = {}
+    for _ in devices:
+        hubs.setdefault(get_upstream_hub(_), []).append(_)
+    return hubs
+
+
+def schedule_per_hub(
+    devices: list[Path],
+    function,
+    *,
+    max_per_hub: int = 1,
+    stop_event: threading.Event | None = None,
+) -> list:
+    """
+    Call function(device) for every device, at most max_per_hub at a time
+    behind any one usb hub, with separate hubs running in parallel.
+    Opening and toggling many ports on one hub at once (worst at high baud
+    rates) causes bus contention and dropped bytes.
+    Results are returned in the order of devices. Devices not started
+    before stop_event is set are skipped (result None).
+    """
+    if max_per_hub < 1:
+        raise ValueError(f"{max_per_hub=} must be >= 1")
+    if stop_event is None:
+        stop_event = threading.Event()
+
+    _results: dict[Path, object] = {}
+
+    def _worker(hub_queue: deque) -> None:
+        while not stop_event.is_set():
+            try:
+                _device = hub_queue.popleft()
+            except IndexError:
+                return
+            _results[_device] = function(_device)
+
+    _hub_queues = [deque(_) for _ in group_devices_by_hub(devices).values()]
+    _workers = sum(min(max_per_hub, len(_)) for _ in _hub_queues)
+    if _workers:
+        with ThreadPoolExecutor(max_workers=_workers) as executor:
+            _futures = [
+                executor.submit(_worker, _hub_queue)
+                for _hub_queue in _hub_queues
+                for _ in range(min(max_per_hub, len(_hub_queue)))
+            ]
+            for _future in _futures:
+                _future.result()
+    return [_results.get(_) for _ in devices]
+
+
+def probe_devices(
+    devices: list[Path],
+    *,
+    max_probes_per_hub: int = 1,
+    **probe_kwargs,
+) -> Path | None:
+    _stop_event = threading.Event()
+
+    def _probe(device: Path) -> bool:
+        if probe_device(device, **probe_kwargs):
+            _stop_event.set()
+            return True
+        return False
+
+    _results = schedule_per_hub(
+        devices,
+        _probe,
+        max_per_hub=max_probes_per_hub,
+        stop_event=_stop_event,
+    )
+    for _device, _matched in zip(devices, _results):
+        if _matched:
+            return _device
+    return None
+
+
 def find_device(
     *,
     baud_rate: int,
-    timeout: int = 1,
+    timeout: float = 1,
     command_hex: str | None = None,
     response_hex: str | None = None,
+    probe: Probe | None = None,
     usb_id: str | None = None,
     serial_number: str | None = None,
     manufacturer: str | None = None,
+    interface_number: int | None = None,
     log_serial_data: bool = False,
     data_dir: Path = DATA_DIR,
     tries: int = 1,
     retry_delay: float = 0.5,
+    devices: list[Path] | None = None,
+    max_probes_per_hub: int = 1,
+    capture: SerialCapture | None = None,
 ):
+    """
+    log_serial_data writes a capture file per call in data_dir, pass
+    capture= to record many calls (a session) into one file instead.
+    """
 
-    minone([command_hex, usb_id, serial_number, manufacturer])
+    minone([command_hex, probe, usb_id, serial_number, manufacturer])
 
     if command_hex:
         if not response_hex:
             raise ValueError(
                 "passing a command_hex argument requires that response_hex argument also be specified."
             )
+        if probe:
+            raise ValueError("pass either command_hex/response_hex or probe, not both.")
+        probe = HexProbe(command_hex=command_hex, response_hex=response_hex)
 
-    if usb_id:
+    if devices is not None:
+        # caller restricted the search to these ports
+        _devices = sort_devices_by_adapter(devices)
+        if usb_id:
+            _devices = [_ for _ in _devices if get_usb_id_for_device(_) == usb_id]
+    elif usb_id:
         _devices = get_devices_for_usb_id(usb_id)
     else:
-        _devices = get_devices()
+        _devices = sort_devices_by_adapter(get_devices())
 
     icp(
         _devices,
@@ -162,102 +590,747 @@ def find_device(
         timeout,
         command_hex,
         response_hex,
+        probe,
         usb_id,
         serial_number,
         manufacturer,
+        interface_number,
         log_serial_data,
         data_dir,
         tries,
         retry_delay,
+        max_probes_per_hub,
     )
 
-    for attempt in range(1, tries + 1):
-        if attempt > 1:
-            eprint(f"find_device: attempt {attempt}/{tries}")
-            time.sleep(retry_delay)
+    # probe traffic goes to a binary capture file instead of SerialMinimal's text log
+    _own_capture = None
+    if capture is None and log_serial_data and probe:
+        capture = _own_capture = SerialCapture(data_dir)
+    try:
+        for attempt in range(1, tries + 1):
+            if attempt > 1:
+                eprint(f"find_device: attempt {attempt}/{tries}")
+                time.sleep(retry_delay)
+
+            # one generation check for the whole attribute pass, not one per port
+            with pinned_enumeration_generation():
+                _candidates = []
+                for _ in _devices:
+                    if interface_number is not None:
+                        try:
+                            if get_usb_tty_device(_).interface_number != interface_number:
+                                # another port on a multi-port adapter, go to next device
+                                continue
+                        except ValueError:
+                            # not backed by a usb interface, skip to next device
+                            continue
 
-        for _ in _devices:
-            if serial_number:
-                try:
-                    _serial_number = get_serial_number_for_device(_)
-                    if _serial_number != serial_number:
-                        # serial does not match, go to next device
-                        continue
-                except ValueError:
-                    # device does not have a serial attribute, skip to next device
-                    continue
+                    if serial_number:
+                        try:
+                            _serial_number = get_serial_number_for_device(_)
+                            if _serial_number != serial_number:
+                                # serial does not match, go to next device
+                                continue
+                        except ValueError:
+                            # device does not have a serial attribute, skip to next device
+                            continue
 
-            if manufacturer:
-                try:
-                    _manufacturer = get_manufacturer_for_device(_)
-                    if _manufacturer != manufacturer:
-                        # manufacturer does not match, go to next device
-                        continue
-                except ValueError:
-                    # device does not have a manufacturer attribute, skip to next device
+                    if manufacturer:
+                        try:
+                            _manufacturer = get_manufacturer_for_device(_)
+                            if _manufacturer != manufacturer:
+                                # manufacturer does not match, go to next device
+                                continue
+                        except ValueError:
+                            # device does not have a manufacturer attribute, skip to next device
+                            continue
+
+                    _candidates.append(_)
+
+            if not _candidates:
+                continue
+
+            if not probe:
+                # all checks passed, found the correct device
+                icp(_candidates[0])
+                return _candidates[0]
+
+            # bug more than one device may match, the first to answer wins
+            _ = probe_devices(
+                _candidates,
+                probe=probe,
+                baud_rate=baud_rate,
+                timeout=timeout,
+                data_dir=data_dir,
+                capture=capture,
+                max_probes_per_hub=max_probes_per_hub,
+            )
+            if _:
+                icp(_)
+                return _
+    finally:
+        if _own_capture:
+            _own_capture.close()
+
+    raise ValueError(
+        f"Error: No matching device found for {probe=} {baud_rate=} {usb_id=} {serial_number=} {manufacturer=} {interface_number=} {timeout=} {tries=} {retry_delay=}"
+    )
+
+
+def parse_device_spec(spec: str) -> tuple[str, dict]:
+    """
+    NAME:key=value,key=value -> (NAME, find_device() kwargs)
+    ex: gps:usb_id=0403:6011,interface_number=2
+    """
+    try:
+        name, _spec = spec.split(":", 1)
+    except ValueError:
+        raise ValueError(f"device spec {spec=} must look like NAME:key=value,...")
+    if not UDEV_SAFE_VALUE.fullmatch(name) or name in (".", ".."):
+        raise ValueError(
+            f"invalid device spec name {name=}, use only letters, digits, '.', '_' and '-'"
+        )
+
+    kwargs: dict = {"baud_rate": 9600}
+    _probe_arguments = {}
+    for _item in _spec.split(","):
+        try:
+            _key, _value = _item.split("=", 1)
+        except ValueError:
+            raise ValueError(f"device spec {spec=} item {_item=} must look like key=value")
+        _key = _key.strip()
+        if _key.startswith("probe."):
+            # ex: probe=modbus-rtu,probe.address=5
+            _probe_arguments[_key.removeprefix("probe.")] = _value.strip()
+            continue
+        if _key not in DEVICE_SPEC_KEYS:
+            raise ValueError(
+                f"device spec {spec=} unknown key {_key=}, expected one of {sorted(DEVICE_SPEC_KEYS)}"
+            )
+        kwargs[_key] = DEVICE_SPEC_KEYS[_key](_value.strip())
+
+    if "probe" in kwargs:
+        kwargs["probe"] = make_probe(kwargs["probe"], **_probe_arguments)
+    elif _probe_arguments:
+        raise ValueError(f"device spec {spec=} has probe. arguments but no probe=")
+    return name, kwargs
+
+
+def read_device_spec_strings(
+    specs: tuple[str, ...] | list[str],
+    spec_file: Path | None = None,
+) -> dict[str, str]:
+    _specs = list(specs)
+    if spec_file:
+        for _l in spec_file.read_text().splitlines():
+            _l = _l.strip()
+            if _l and not _l.startswith("#"):
+                _specs.append(_l)
+
+    spec_strings: dict[str, str] = {}
+    for _ in _specs:
+        name, _kwargs = parse_device_spec(_)
+        if name in spec_strings:
+            raise ValueError(f"duplicate device spec name {name=}")
+        spec_strings[name] = _
+    return spec_strings
+
+
+def read_device_specs(
+    specs: tuple[str, ...] | list[str],
+    spec_file: Path | None = None,
+) -> dict[str, dict]:
+    device_specs = {
+        name: parse_device_spec(_)[1]
+        for name, _ in read_device_spec_strings(specs, spec_file).items()
+    }
+    if not device_specs:
+        raise ValueError("no device specs given")
+    return device_specs
+
+
+def get_stable_udev_match(
+    device: UsbTtyDevice,
+    devices: list[UsbTtyDevice],
+) -> str:
+    # The usb serial number survives a move to another port, so prefer it,
+    # but only when no other attached adapter reports the same one.
+    _same_serial = [
+        _
+        for _ in devices
+        if _.usb_id == device.usb_id
+        and _.serial_number == device.serial_number
+        and _.interface_number == device.interface_number
+    ]
+    if (
+        device.serial_number
+        and UDEV_SAFE_VALUE.fullmatch(device.serial_number)
+        and len(_same_serial) == 1
+    ):
+        _id_vendor, _id_product = device.usb_id.split(":")
+        # ATTRS{} keys must all match on the same parent (the usb device),
+        # the interface number comes from the usb_id builtin in 60-serial.rules
+        return (
+            f'ATTRS{{idVendor}}=="{_id_vendor}", '
+            f'ATTRS{{idProduct}}=="{_id_product}", '
+            f'ATTRS{{serial}}=="{device.serial_number}", '
+            f'ENV{{ID_USB_INTERFACE_NUM}}=="{device.interface_number:02x}"'
+        )
+    # fall back to the physical port path + interface, ex: 1-1.2:1.0
+    # (kernel names are always safe in a udev string)
+    return f'KERNELS=="{device.interface.name}"'
+
+
+def resolve_pinned_devices(
+    device_specs: dict[str, dict],
+    capture: SerialCapture | None = None,
+) -> dict[str, UsbTtyDevice]:
+    pinned = {}
+    for name, kwargs in device_specs.items():
+        _device = find_device(**kwargs, capture=capture)
+        pinned[name] = get_usb_tty_device(_device)
+    _devices = list(pinned.values())
+    for name, _device in pinned.items():
+        if _devices.count(_device) > 1:
+            raise ValueError(f"{name=} resolved to {_device.device} which another spec also resolved to")
+    return pinned
+
+
+def render_udev_rules(pinned: dict[str, UsbTtyDevice]) -> str:
+    _all_devices = get_usb_tty_devices()
+    _lines = ["# generated by usbtool pin, do not edit"]
+    for name, _device in sorted(pinned.items()):
+        _match = get_stable_udev_match(_device, _all_devices)
+        _lines.append(f"# {name}: {_device.usb_id} {_device.manufacturer} {_device.product}")
+        _lines.append(
+            f'SUBSYSTEM=="tty", {_match}, SYMLINK+="{PINNED_DEVICE_DIR.relative_to("/dev")}/{name}"'
+        )
+    return "\n".join(_lines) + "\n"
+
+
+def get_udev_rules_diff(rules: str, rules_file: Path = UDEV_RULES_FILE) -> str:
+    try:
+        _installed = rules_file.read_text()
+    except FileNotFoundError:
+        _installed = ""
+    _ = difflib.unified_diff(
+        _installed.splitlines(keepends=True),
+        rules.splitlines(keepends=True),
+        fromfile=rules_file.as_posix(),
+        tofile=f"{rules_file.as_posix()} (new)",
+    )
+    return "".join(_)
+
+
+def install_udev_rules(rules: str, rules_file: Path = UDEV_RULES_FILE) -> None:
+    _tmp = rules_file.with_name(f".{rules_file.name}.tmp")
+    _tmp.write_text(rules)
+    _tmp.replace(rules_file)
+    sh.udevadm("control", "--reload-rules")
+    sh.udevadm("trigger", "--subsystem-match=tty")
+
+
+def get_stale_pinned_symlinks(
+    pinned: dict[str, UsbTtyDevice],
+    directory: Path = PINNED_DEVICE_DIR,
+) -> list[Path]:
+    # links (ex: from an earlier pin --symlinks) for names not in this spec set
+    if not directory.is_dir():
+        return []
+    return sorted(
+        _
+        for _ in directory.iterdir()
+        if _.is_symlink() and _.name not in pinned and not _.name.startswith(".")
+    )
+
+
+def create_pinned_symlinks(
+    pinned: dict[str, UsbTtyDevice],
+    directory: Path = PINNED_DEVICE_DIR,
+    prune: bool = False,
+) -> None:
+    """
+    Not persistent across reboots, use the udev rules for that.
+    Links for names not in pinned are left alone unless prune is set.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    for name, _device in pinned.items():
+        _link = directory / name
+        _tmp = directory / f".{name}.tmp"
+        _tmp.unlink(missing_ok=True)
+        _tmp.symlink_to(_device.device)
+        _tmp.replace(_link)
+    if prune:
+        for _ in get_stale_pinned_symlinks(pinned, directory):
+            _.unlink(missing_ok=True)
+
+
+def get_pinned_device(name: str, directory: Path = PINNED_DEVICE_DIR) -> Path:
+    _ = directory / name
+    if not _.exists():
+        raise ValueError(f"no pinned device {name=} in {directory}, see usbtool pin")
+    return _
+
+
+def get_port_identities() -> dict[Path, tuple]:
+    # devnum is reassigned on every (re)plug, so a replug onto the same tty name is still a change
+    return {
+        _.device: (_.usb_device, _.interface_number, _.busnum, _.devnum)
+        for _ in get_usb_tty_devices()
+    }
+
+
+def verify_device(
+    device: Path,
+    kwargs: dict,
+    capture: SerialCapture | None = None,
+) -> bool:
+    try:
+        return (
+            find_device(**{**kwargs, "devices": [device], "tries": 1, "capture": capture})
+            == device
+        )
+    except ValueError:
+        return False
+    except (SerialException, OSError) as e:
+        # the port went away mid-probe, the next poll sees the unplug
+        ic(e)
+        return False
+
+
+class DeviceWatcher:
+    """
+    Keep a spec name -> port mapping current across hotplug.
+    Only ports that appeared or changed since the last poll are probed.
+    Events are dicts: {"event": "found"|"moved"|"lost", "name", "device", "previous_device", "timestamp"}
+    """
+
+    def __init__(
+        self,
+        device_specs: dict[str, dict],
+        capture: SerialCapture | None = None,
+    ):
+        self.device_specs = device_specs
+        self.capture = capture
+        self.mapping: dict[str, Path | None] = {name: None for name in device_specs}
+        self._ports: dict[Path, tuple] = {}
+        self._generation: tuple | None = None
+
+    def _event(self, event: str, name: str, device: Path | None, previous_device: Path | None) -> dict:
+        return {
+            "event": event,
+            "name": name,
+            "device": device.as_posix() if device else None,
+            "previous_device": previous_device.as_posix() if previous_device else None,
+            "timestamp": time.time(),
+        }
+
+    def poll(self) -> list[dict]:
+        _generation = get_enumeration_generation()
+        if _generation == self._generation:
+            return []
+        self._generation = _generation
+
+        _ports = get_port_identities()
+        _changed = {_ for _, _identity in _ports.items() if self._ports.get(_) != _identity}
+        _removed = set(self._ports) - set(_ports)
+        self._ports = _ports
+
+        _claimed = {
+            _
+            for _ in self.mapping.values()
+            if _ is not None and _ not in _changed and _ not in _removed
+        }
+        events = []
+        for name, kwargs in self.device_specs.items():
+            _device = self.mapping[name]
+            if _device is not None and _device not in _changed and _device not in _removed:
+                continue
+
+            _candidates = sorted(_changed - _claimed)
+            if _device in _candidates:
+                # same tty name, different usb device: one probe says if it is still ours
+                if verify_device(_device, kwargs, self.capture):
+                    _claimed.add(_device)
                     continue
+                _candidates.remove(_device)
 
-            if command_hex:
-                _tx_bytes = bytes.fromhex(command_hex)
-                _expected_rx_bytes = bytes.fromhex(response_hex)
+            _found = None
+            if _candidates:
                 try:
-                    serial_oracle = SerialMinimal(
-                        data_dir=data_dir,
-                        log_serial_data=log_serial_data,
-                        serial_port=_.as_posix(),
-                        baud_rate=baud_rate,
-                        default_timeout=timeout,
+                    _found = find_device(
+                        **{**kwargs, "devices": _candidates, "tries": 1, "capture": self.capture}
                     )
-                except PermissionError as e:
+                except (ValueError, SerialException, OSError) as e:
                     ic(e)
-                    eprint(
-                        f"ERROR: PermissionError on port {_.as_posix()} (Skipped searching this port)"
-                    )
-                    continue
-                except SerialException as e:
-                    ic(e)
-                    eprint(
-                        f"ERROR: SerialException on port {_.as_posix()} (Skipped searching this port, likely in use)"
+
+            if _found is not None:
+                _claimed.add(_found)
+                self.mapping[name] = _found
+                events.append(self._event("found" if _device is None else "moved", name, _found, _device))
+            elif _device is not None:
+                self.mapping[name] = None
+                events.append(self._event("lost", name, None, _device))
+        return events
+
+    def run(
+        self,
+        callback,
+        *,
+        poll_interval: float = 0.5,
+        stop_event: threading.Event | None = None,
+    ) -> None:
+        if stop_event is None:
+            stop_event = threading.Event()
+        while not stop_event.is_set():
+            for _ in self.poll():
+                callback(_)
+            stop_event.wait(poll_interval)
+
+
+def dataclass_to_dict(instance) -> dict:
+    # json friendly: Path -> str
+    return {
+        _key: _value.as_posix() if isinstance(_value, Path) else _value
+        for _key, _value in dataclasses.asdict(instance).items()
+    }
+
+
+def get_inventory_snapshot(
+    spec_strings: dict[str, str] | None = None,
+    capture: SerialCapture | None = None,
+) -> dict:
+    """
+    every usb tty with its sysfs attributes, plus the port each named
+    spec (probe identity) resolved to
+    """
+    _identities = {}
+    for name, _spec in (spec_strings or {}).items():
+        _device = find_device(**parse_device_spec(_spec)[1], capture=capture)
+        _identities[name] = {"spec": _spec, "device": _device.as_posix()}
+    return {
+        "version": INVENTORY_VERSION,
+        "created": time.time(),
+        "devices": [dataclass_to_dict(_) for _ in get_usb_tty_devices()],
+        "identities": _identities,
+    }
+
+
+def save_inventory(inventory: dict, inventory_file: Path = INVENTORY_FILE) -> None:
+    _tmp = inventory_file.with_name(f".{inventory_file.name}.tmp")
+    _tmp.write_text(json.dumps(inventory, indent=2, sort_keys=True) + "\n")
+    _tmp.replace(inventory_file)
+
+
+def load_inventory(inventory_file: Path = INVENTORY_FILE) -> dict:
+    inventory = json.loads(inventory_file.read_text())
+    if inventory.get("version") != INVENTORY_VERSION:
+        raise ValueError(
+            f"{inventory_file} has inventory version {inventory.get('version')}, expected {INVENTORY_VERSION}"
+        )
+    return inventory
+
+
+def diff_inventory(inventory: dict) -> dict[str, list[str]]:
+    """
+    compare a snapshot to the live system from sysfs alone (no probes).
+    devnum is part of each record, so a replug shows up as changed.
+    """
+    _recorded = {_["device"]: _ for _ in inventory["devices"]}
+    _live = {_["device"]: _ for _ in map(dataclass_to_dict, get_usb_tty_devices())}
+    return {
+        "added": sorted(set(_live) - set(_recorded)),
+        "removed": sorted(set(_recorded) - set(_live)),
+        "changed": sorted(
+            _ for _ in set(_recorded) & set(_live) if _recorded[_] != _live[_]
+        ),
+    }
+
+
+def find_device_in_inventory(
+    inventory: dict,
+    *,
+    name: str | None = None,
+    baud_rate: int | None = None,
+    probe: Probe | None = None,
+    usb_id: str | None = None,
+    serial_number: str | None = None,
+    manufacturer: str | None = None,
+    interface_number: int | None = None,
+) -> Path | None:
+    """
+    Answer a lookup from the snapshot. None when the snapshot can not answer
+    it, or when the live system changed in a way relevant to the answer;
+    the caller then falls back to find_device().
+    """
+    # interface_number only narrows a lookup, same as find_device()
+    if not any([name, probe, usb_id, serial_number, manufacturer]):
+        raise ValueError(
+            "at least one of name, probe, usb_id, serial_number or manufacturer is required"
+        )
+
+    _diff = diff_inventory(inventory)
+    _stale = set(_diff["removed"]) | set(_diff["changed"])
+
+    if name or probe:
+        # a probe identity is only known for ports it was resolved to at save time
+        for _name, _identity in inventory["identities"].items():
+            if name and _name != name:
+                continue
+            if probe:
+                _kwargs = parse_device_spec(_identity["spec"])[1]
+                _probe = _kwargs.get("probe")
+                if "command_hex" in _kwargs:
+                    _probe = HexProbe(
+                        command_hex=_kwargs["command_hex"],
+                        response_hex=_kwargs.get("response_hex", ""),
                     )
+                if _probe != probe or _kwargs["baud_rate"] != baud_rate:
                     continue
+            if _identity["device"] in _stale:
+                return None
+            _devices = [_ for _ in inventory["devices"] if _["device"] == _identity["device"]]
+            break
+        else:
+            return None
+        if not _devices:
+            return None
+    else:
+        _devices = inventory["devices"]
 
+    def _matches(device: dict) -> bool:
+        return (
+            (not usb_id or device["usb_id"] == usb_id)
+            and (not serial_number or device["serial_number"] == serial_number)
+            and (not manufacturer or device["manufacturer"] == manufacturer)
+            and (interface_number is None or device["interface_number"] == interface_number)
+        )
 
-                try:
-                    # Flush stale bytes left over from prior probes / device boot chatter
-                    try:
-                        serial_oracle.ser.reset_input_buffer()
-                        serial_oracle.ser.reset_output_buffer()
-                    except Exception as e:
-                        ic(e)
-
-                    _bytes_written = serial_oracle.ser.write(_tx_bytes)
-                    serial_oracle.ser.flush()
-                    assert _bytes_written == len(_tx_bytes)
-                    eprint(f"{_tx_bytes=}")
-
-                    # Sized read returns as soon as N bytes arrive (or timeout),
-                    # instead of waiting the full timeout like readall() does.
-                    _bytes_read = serial_oracle.ser.read(len(_expected_rx_bytes))
-                    eprint(f"{_bytes_read=}", f"{_expected_rx_bytes=}")
-                    if _bytes_read != _expected_rx_bytes:
-                        # not a match, skip to next
-                        # bug more than one device may match
-                        continue
-                finally:
-                    try:
-                        serial_oracle.ser.close()
-                    except Exception as e:
-                        ic(e)
-
-            # all checks passed, found the correct device
-            icp(_)
-            return _
+    _matched = [_ for _ in _devices if _matches(_)]
+    if not _matched or _matched[0]["device"] in _stale:
+        return None
+    if not (name or probe):
+        # a port that appeared or changed since the snapshot could match the attributes too
+        _live = {_.device.as_posix(): _ for _ in get_usb_tty_devices()}
+        for _ in _diff["added"] + _diff["changed"]:
+            if _matches(dataclass_to_dict(_live[_])):
+                return None
+    return Path(_matched[0]["device"])
 
-    raise ValueError(
-        f"Error: No matching device found for {command_hex=} {response_hex=} {baud_rate=} {usb_id=} {serial_number=} {manufacturer=} {timeout=} {tries=} {retry_delay=}"
+
+ECHO_PAYLOAD = bytes(range(16))
+
+
+@dataclass(frozen=True)
+class PortBenchmark:
+    device: Path
+    baud_rate: int
+    open_latency: float | None  # seconds
+    first_byte_latency: float | None  # median, seconds from start of write
+    round_trip_p50: float | None
+    round_trip_p90: float | None
+    round_trip_p99: float | None
+    throughput: float | None  # bytes/s, echo only
+    iterations: int
+    failures: int
+    recommended_timeout: float | None  # seconds, for find_device(timeout=)
+
+
+def percentile(values: list[float], percent: float) -> float | None:
+    # nearest rank
+    if not values:
+        return None
+    _values = sorted(values)
+    _rank = max(1, math.ceil(percent / 100 * len(_values)))
+    return _values[_rank - 1]
+
+
+def recommend_timeout(round_trip_p99: float | None) -> float | None:
+    # 3x the slowest normal reply, but never less than 20ms of slack for scheduler/usb latency;
+    # rounded up to whole ms
+    if round_trip_p99 is None:
+        return None
+    _milliseconds = max(round_trip_p99 * 3, round_trip_p99 + 0.02) * 1000
+    # round() first: float noise (0.1 * 3 * 1000 == 300.00000000000006) must not add a ms
+    return math.ceil(round(_milliseconds, 6)) / 1000
+
+
+def measure_echo_throughput(
+    ser,
+    payload: bytes,
+    *,
+    timeout: float,
+    chunk_size: int = 256,
+) -> float | None:
+    """
+    -> bytes/s of the echo, None if it did not come back intact in time.
+    The payload is written in chunks and the echo drained between them, so
+    both directions run at once as they would in sustained use, and the
+    receive buffer does not overflow while the transmit side is still busy.
+    """
+    _received = bytearray()
+    _start = time.monotonic()
+    _deadline = _start + timeout
+    for _offset in range(0, len(payload), chunk_size):
+        _chunk = payload[_offset : _offset + chunk_size]
+        _bytes_written = ser.write(_chunk)
+        if _bytes_written != len(_chunk):
+            eprint(f"ERROR: short write on port {ser.port} {_bytes_written=} {len(_chunk)=}")
+            return None
+        if ser.in_waiting:
+            _received += ser.read(ser.in_waiting)
+        if _received != payload[: len(_received)]:
+            ic(len(_received))
+            return None
+        if time.monotonic() > _deadline:
+            ic(len(_received))
+            return None
+
+    while len(_received) < len(payload):
+        _remaining = _deadline - time.monotonic()
+        if _remaining <= 0:
+            break
+        ser.timeout = _remaining
+        _chunk = ser.read(max(1, min(ser.in_waiting, len(payload) - len(_received))))
+        if not _chunk:
+            break
+        _received += _chunk
+    _end = time.monotonic()
+    if bytes(_received[: len(payload)]) != payload:
+        ic(len(_received))
+        return None
+    return len(payload) / (_end - _start)
+
+
+def benchmark_port(
+    device: Path,
+    *,
+    baud_rate: int,
+    probe: Probe,
+    iterations: int = 20,
+    timeout: float = 1,
+    throughput_bytes: int = 0,
+    data_dir: Path = DATA_DIR,
+) -> PortBenchmark:
+    """
+    Open the port, then run probe iterations times. With throughput_bytes
+    the port must echo (loopback plug or echo firmware): that many bytes
+    are written and read back.
+    """
+    _start = time.monotonic()
+    try:
+        serial_oracle = SerialMinimal(
+            data_dir=data_dir,
+            log_serial_data=False,
+            serial_port=device.as_posix(),
+            baud_rate=baud_rate,
+            default_timeout=timeout,
+        )
+    except (PermissionError, SerialException) as e:
+        ic(e)
+        eprint(f"ERROR: {e!r} on port {device.as_posix()} (Skipped benchmarking this port)")
+        return PortBenchmark(
+            device=device,
+            baud_rate=baud_rate,
+            open_latency=None,
+            first_byte_latency=None,
+            round_trip_p50=None,
+            round_trip_p90=None,
+            round_trip_p99=None,
+            throughput=None,
+            iterations=iterations,
+            failures=iterations,
+            recommended_timeout=None,
+        )
+    _open_latency = time.monotonic() - _start
+
+    _first_byte_latencies = []
+    _round_trips = []
+    _failures = 0
+    _throughput = None
+    try:
+        try:
+            serial_oracle.ser.reset_input_buffer()
+            serial_oracle.ser.reset_output_buffer()
+        except Exception as e:
+            ic(e)
+
+        _tx_bytes = probe.request()
+        for _ in range(iterations):
+            _start = time.monotonic()
+            _bytes_written = serial_oracle.ser.write(_tx_bytes)
+            serial_oracle.ser.flush()
+            if _bytes_written != len(_tx_bytes):
+                # a short write is a failure, not a slow reply
+                eprint(f"ERROR: short write on port {device.as_posix()} {_bytes_written=} {len(_tx_bytes)=}")
+                _failures += 1
+                serial_oracle.ser.reset_input_buffer()
+                continue
+            _verdict, _bytes_read, _first_byte_time = read_probe_reply(
+                serial_oracle.ser,
+                probe,
+                timeout=timeout,
+            )
+            _end = time.monotonic()
+            if _verdict is not True:
+                _failures += 1
+                ic(device, _bytes_read)
+                # drop a late reply so it does not land in the next iteration
+                serial_oracle.ser.reset_input_buffer()
+                continue
+            _first_byte_latencies.append(_first_byte_time - _start)
+            _round_trips.append(_end - _start)
+
+        if throughput_bytes:
+            _throughput = measure_echo_throughput(
+                serial_oracle.ser,
+                bytes(_ % 256 for _ in range(throughput_bytes)),
+                # 10 bits per byte on the wire, twice the wire time is plenty
+                timeout=timeout + 2 * throughput_bytes * 10 / baud_rate,
+            )
+    finally:
+        try:
+            serial_oracle.ser.close()
+        except Exception as e:
+            ic(e)
+
+    _round_trip_p99 = percentile(_round_trips, 99)
+    return PortBenchmark(
+        device=device,
+        baud_rate=baud_rate,
+        open_latency=_open_latency,
+        first_byte_latency=percentile(_first_byte_latencies, 50),
+        round_trip_p50=percentile(_round_trips, 50),
+        round_trip_p90=percentile(_round_trips, 90),
+        round_trip_p99=_round_trip_p99,
+        throughput=_throughput,
+        iterations=iterations,
+        failures=_failures,
+        recommended_timeout=recommend_timeout(_round_trip_p99),
     )
 
 
+def benchmark_ports(
+    devices: list[Path],
+    *,
+    baud_rates: list[int],
+    max_per_hub: int = 1,
+    **benchmark_kwargs,
+) -> list[PortBenchmark]:
+    """
+    ports behind different hubs are benchmarked in parallel, baud rates of one port in sequence
+    """
+
+    def _benchmark(device: Path) -> list[PortBenchmark]:
+        return [
+            benchmark_port(device, baud_rate=_baud_rate, **benchmark_kwargs)
+            for _baud_rate in baud_rates
+        ]
+
+    _results = schedule_per_hub(devices, _benchmark, max_per_hub=max_per_hub)
+    return [_ for _device_results in _results for _ in _device_results]
+
+
 @click.group(context_settings=CONTEXT_SETTINGS, no_args_is_help=True, cls=AHGroup)
 @click_add_options(click_global_options)
 @click.pass_context
@@ -307,6 +1380,42 @@ def list_usb_tty_devices(
         )
 
 
+@cli.command("list-usb-adapters")
+@click_add_options(click_global_options)
+@click.pass_context
+def _list_usb_adapters(
+    ctx,
+    verbose_inf: bool,
+    dict_output: bool,
+    verbose: bool = False,
+) -> None:
+
+    tty, verbose = tvicgvd(
+        ctx=ctx,
+        verbose=verbose,
+        verbose_inf=verbose_inf,
+        ic=ic,
+        gvd=gvd,
+    )
+
+    _adapters = group_devices_by_adapter(get_usb_tty_devices())
+    for _usb_device, _ports in _adapters.items():
+        _first = _ports[0]
+        output(
+            f"{_first.port_path} {_first.usb_id} serial={_first.serial_number} {_first.manufacturer} {_first.product}",
+            reason=None,
+            tty=tty,
+            dict_output=False,
+        )
+        for _ in _ports:
+            output(
+                f"  interface={_.interface_number} {_.device.as_posix()}",
+                reason=None,
+                tty=tty,
+                dict_output=False,
+            )
+
+
 @cli.command("get-devices-for-usb-id")
 @click.argument("usb_id")
 @click_add_options(click_global_options)
@@ -340,9 +1449,13 @@ def _get_devices_for_usb_id(
 @cli.command("find-device")
 @click.option("--command-hex", type=str)
 @click.option("--response-hex", type=str)
+# not a click.Choice: probes registered after import must be selectable, make_probe() validates
+@click.option("--probe", "probe_name", type=str)
+@click.option("--probe-arg", "probe_arguments", type=str, multiple=True)
 @click.option("--usb-id")
 @click.option("--serial-number")
 @click.option("--manufacturer")
+@click.option("--interface", "interface_number", type=int)
 @click.option(
     "--data-dir",
     type=click.Path(
@@ -356,9 +1469,22 @@ def _get_devices_for_usb_id(
 )
 @click.option("--baud-rate", type=int, default=9600)
 @click.option("--log-serial-data", is_flag=True)
-@click.option("--timeout", type=int, default=1)
+@click.option("--timeout", type=float, default=1)
 @click.option("--tries", type=int, default=1)
 @click.option("--retry-delay", type=float, default=0.5)
+@click.option("--max-probes-per-hub", type=int, default=1)
+@click.option(
+    "--from-inventory",
+    "inventory_file",
+    type=click.Path(
+        exists=True,
+        dir_okay=False,
+        file_okay=True,
+        path_type=Path,
+        allow_dash=False,
+    ),
+)
+@click.option("--name", type=str)
 @click_add_options(click_global_options)
 @click.pass_context
 def _find_device(
@@ -366,18 +1492,29 @@ def _find_device(
     usb_id: str,
     serial_number: str,
     manufacturer: str,
+    interface_number: int | None,
     data_dir: Path,
     command_hex: str,
     response_hex: str,
+    probe_name: str | None,
+    probe_arguments: tuple[str, ...],
     baud_rate: int,
     log_serial_data: bool,
-    timeout: int,
+    timeout: float,
     tries: int,
     retry_delay: float,
+    max_probes_per_hub: int,
+    inventory_file: Path | None,
+    name: str | None,
     verbose_inf: bool,
     dict_output: bool,
     verbose: bool = False,
 ) -> None:
+    """
+    --from-inventory answers from a usbtool inventory save snapshot when
+    the live sysfs state shows no relevant change, --name looks up a spec
+    recorded in it.
+    """
 
     tty, verbose = tvicgvd(
         ctx=ctx,
@@ -393,19 +1530,68 @@ def _find_device(
                 f"{command_hex=} requires --response-hex to be specified as well."
             )
 
-    _ = find_device(
-        command_hex=command_hex,
-        response_hex=response_hex,
-        baud_rate=baud_rate,
-        timeout=timeout,
-        usb_id=usb_id,
-        serial_number=serial_number,
-        manufacturer=manufacturer,
-        log_serial_data=log_serial_data,
-        data_dir=data_dir,
-        tries=tries,
-        retry_delay=retry_delay,
-    )
+    _probe = None
+    if probe_name:
+        _probe = make_probe(probe_name, **parse_probe_arguments(probe_arguments))
+    elif probe_arguments:
+        raise ValueError(f"{probe_arguments=} requires --probe to be specified as well.")
+
+    if name and not inventory_file:
+        raise ValueError(f"{name=} requires --from-inventory to be specified as well.")
+
+    _ = None
+    if inventory_file:
+        if not any([name, command_hex, _probe, usb_id, serial_number, manufacturer]):
+            raise ValueError(
+                "--from-inventory requires --name, a probe, --usb-id, --serial-number or --manufacturer"
+            )
+        _inventory = load_inventory(inventory_file)
+        _inventory_probe = _probe
+        if command_hex:
+            _inventory_probe = HexProbe(command_hex=command_hex, response_hex=response_hex)
+        _ = find_device_in_inventory(
+            _inventory,
+            name=name,
+            baud_rate=baud_rate,
+            probe=_inventory_probe,
+            usb_id=usb_id,
+            serial_number=serial_number,
+            manufacturer=manufacturer,
+            interface_number=interface_number,
+        )
+        if _ is None:
+            eprint(f"find-device: {inventory_file} can not answer this lookup, searching the live system")
+
+    if _ is None and name:
+        try:
+            _spec = _inventory["identities"][name]["spec"]
+        except KeyError:
+            raise ValueError(f"{name=} is not in {inventory_file}")
+        _ = find_device(
+            **{
+                **parse_device_spec(_spec)[1],
+                "log_serial_data": log_serial_data,
+                "data_dir": data_dir,
+                "max_probes_per_hub": max_probes_per_hub,
+            }
+        )
+    elif _ is None:
+        _ = find_device(
+            command_hex=command_hex,
+            response_hex=response_hex,
+            probe=_probe,
+            baud_rate=baud_rate,
+            timeout=timeout,
+            usb_id=usb_id,
+            serial_number=serial_number,
+            manufacturer=manufacturer,
+            interface_number=interface_number,
+            log_serial_data=log_serial_data,
+            data_dir=data_dir,
+            tries=tries,
+            retry_delay=retry_delay,
+            max_probes_per_hub=max_probes_per_hub,
+        )
 
     if _:
         output(
@@ -442,3 +1628,369 @@ def _get_usb_ids(
             tty=tty,
             dict_output=False,
         )
+
+
+@cli.command("pin")
+@click.argument("specs", type=str, nargs=-1)
+@click.option(
+    "--spec-file",
+    type=click.Path(
+        exists=True,
+        dir_okay=False,
+        file_okay=True,
+        path_type=Path,
+        allow_dash=False,
+    ),
+)
+@click.option("--rules-file", type=click.Path(path_type=Path), default=UDEV_RULES_FILE)
+@click.option("--symlinks", is_flag=True)
+@click.option("--prune", is_flag=True)
+@click.option("--dry-run", is_flag=True)
+@click_add_options(click_global_options)
+@click.pass_context
+def _pin(
+    ctx,
+    specs: tuple[str, ...],
+    spec_file: Path | None,
+    rules_file: Path,
+    symlinks: bool,
+    prune: bool,
+    dry_run: bool,
+    verbose_inf: bool,
+    dict_output: bool,
+    verbose: bool = False,
+) -> None:
+    """
+    SPECS: NAME:key=value,... ex: gps:usb_id=0403:6011,interface_number=2
+
+    The udev rules file is rewritten from SPECS alone. --symlinks leaves
+    existing /dev/serial/by-name links for other names in place, --prune
+    removes them.
+    """
+
+    tty, verbose = tvicgvd(
+        ctx=ctx,
+        verbose=verbose,
+        verbose_inf=verbose_inf,
+        ic=ic,
+        gvd=gvd,
+    )
+
+    if prune and not symlinks:
+        raise ValueError("--prune requires --symlinks to be specified as well.")
+
+    _device_specs = read_device_specs(specs, spec_file)
+    _pinned = resolve_pinned_devices(_device_specs)
+
+    if symlinks:
+        for name, _device in sorted(_pinned.items()):
+            output(
+                f"{(PINNED_DEVICE_DIR / name).as_posix()} -> {_device.device.as_posix()}",
+                reason=None,
+                tty=tty,
+                dict_output=False,
+            )
+        if prune:
+            for _ in get_stale_pinned_symlinks(_pinned):
+                output(
+                    f"remove {_.as_posix()}",
+                    reason=None,
+                    tty=tty,
+                    dict_output=False,
+                )
+        if not dry_run:
+            create_pinned_symlinks(_pinned, prune=prune)
+        return
+
+    _rules = render_udev_rules(_pinned)
+    _diff = get_udev_rules_diff(_rules, rules_file)
+    if _diff:
+        output(
+            _diff,
+            reason=None,
+            tty=tty,
+            dict_output=False,
+        )
+    if dry_run or not _diff:
+        return
+    install_udev_rules(_rules, rules_file)
+
+
+@cli.command("watch")
+@click.argument("specs", type=str, nargs=-1)
+@click.option(
+    "--spec-file",
+    type=click.Path(
+        exists=True,
+        dir_okay=False,
+        file_okay=True,
+        path_type=Path,
+        allow_dash=False,
+    ),
+)
+@click.option("--poll-interval", type=float, default=0.5)
+@click.option(
+    "--data-dir",
+    type=click.Path(
+        exists=True,
+        dir_okay=True,
+        file_okay=False,
+        path_type=Path,
+        allow_dash=False,
+    ),
+    default=DATA_DIR,
+)
+@click.option("--log-serial-data", is_flag=True)
+@click_add_options(click_global_options)
+@click.pass_context
+def _watch(
+    ctx,
+    specs: tuple[str, ...],
+    spec_file: Path | None,
+    poll_interval: float,
+    data_dir: Path,
+    log_serial_data: bool,
+    verbose_inf: bool,
+    dict_output: bool,
+    verbose: bool = False,
+) -> None:
+    """
+    SPECS: NAME:key=value,... ex: gps:usb_id=0403:6011,interface_number=2
+    writes one JSON event per line
+    """
+
+    tty, verbose = tvicgvd(
+        ctx=ctx,
+        verbose=verbose,
+        verbose_inf=verbose_inf,
+        ic=ic,
+        gvd=gvd,
+    )
+
+    def _callback(event: dict) -> None:
+        output(
+            json.dumps(event),
+            reason=None,
+            tty=tty,
+            dict_output=False,
+        )
+
+    # one capture file for the whole watch session
+    _capture = SerialCapture(data_dir) if log_serial_data else None
+    try:
+        _watcher = DeviceWatcher(read_device_specs(specs, spec_file), capture=_capture)
+        _watcher.run(_callback, poll_interval=poll_interval)
+    finally:
+        if _capture:
+            _capture.close()
+
+
+@cli.command("dump-capture")
+@click.argument(
+    "capture_file",
+    type=click.Path(
+        exists=True,
+        dir_okay=False,
+        file_okay=True,
+        path_type=Path,
+        allow_dash=False,
+    ),
+)
+@click_add_options(click_global_options)
+@click.pass_context
+def _dump_capture(
+    ctx,
+    capture_file: Path,
+    verbose_inf: bool,
+    dict_output: bool,
+    verbose: bool = False,
+) -> None:
+
+    tty, verbose = tvicgvd(
+        ctx=ctx,
+        verbose=verbose,
+        verbose_inf=verbose_inf,
+        ic=ic,
+        gvd=gvd,
+    )
+
+    for _ in read_capture(capture_file):
+        output(
+            f"{_.timestamp:.6f} {_.port} {_.direction} {_.data.hex()}",
+            reason=None,
+            tty=tty,
+            dict_output=False,
+        )
+
+
+@cli.group("inventory", cls=AHGroup)
+def _inventory() -> None:
+    pass
+
+
+@_inventory.command("save")
+@click.argument("specs", type=str, nargs=-1)
+@click.option(
+    "--spec-file",
+    type=click.Path(
+        exists=True,
+        dir_okay=False,
+        file_okay=True,
+        path_type=Path,
+        allow_dash=False,
+    ),
+)
+@click.option("--inventory-file", type=click.Path(path_type=Path), default=INVENTORY_FILE)
+@click_add_options(click_global_options)
+@click.pass_context
+def _inventory_save(
+    ctx,
+    specs: tuple[str, ...],
+    spec_file: Path | None,
+    inventory_file: Path,
+    verbose_inf: bool,
+    dict_output: bool,
+    verbose: bool = False,
+) -> None:
+    """
+    SPECS: NAME:key=value,... resolved (probed) once and recorded as identities
+    """
+
+    tty, verbose = tvicgvd(
+        ctx=ctx,
+        verbose=verbose,
+        verbose_inf=verbose_inf,
+        ic=ic,
+        gvd=gvd,
+    )
+
+    _inventory = get_inventory_snapshot(read_device_spec_strings(specs, spec_file))
+    save_inventory(_inventory, inventory_file)
+    output(
+        inventory_file.as_posix(),
+        reason=None,
+        tty=tty,
+        dict_output=False,
+    )
+
+
+@_inventory.command("diff")
+@click.option(
+    "--inventory-file",
+    type=click.Path(
+        exists=True,
+        dir_okay=False,
+        file_okay=True,
+        path_type=Path,
+        allow_dash=False,
+    ),
+    default=INVENTORY_FILE,
+)
+@click_add_options(click_global_options)
+@click.pass_context
+def _inventory_diff(
+    ctx,
+    inventory_file: Path,
+    verbose_inf: bool,
+    dict_output: bool,
+    verbose: bool = False,
+) -> None:
+    """
+    exits 1 when the live system differs from the snapshot
+    """
+
+    tty, verbose = tvicgvd(
+        ctx=ctx,
+        verbose=verbose,
+        verbose_inf=verbose_inf,
+        ic=ic,
+        gvd=gvd,
+    )
+
+    _diff = diff_inventory(load_inventory(inventory_file))
+    for _change, _devices in _diff.items():
+        for _ in _devices:
+            output(
+                f"{_change} {_}",
+                reason=None,
+                tty=tty,
+                dict_output=False,
+            )
+    if any(_diff.values()):
+        ctx.exit(1)
+
+
+@cli.command("bench-port")
+@click.argument("devices", type=click.Path(path_type=Path), nargs=-1)
+@click.option("--baud-rate", "baud_rates", type=int, multiple=True, default=[9600])
+@click.option("--echo", is_flag=True)
+@click.option("--command-hex", type=str)
+@click.option("--response-hex", type=str)
+# not a click.Choice: probes registered after import must be selectable, make_probe() validates
+@click.option("--probe", "probe_name", type=str)
+@click.option("--probe-arg", "probe_arguments", type=str, multiple=True)
+@click.option("--iterations", type=int, default=20)
+@click.option("--timeout", type=float, default=1)
+@click.option("--throughput-bytes", type=int, default=4096)
+@click.option("--max-probes-per-hub", type=int, default=1)
+@click_add_options(click_global_options)
+@click.pass_context
+def _bench_port(
+    ctx,
+    devices: tuple[Path, ...],
+    baud_rates: tuple[int, ...],
+    echo: bool,
+    command_hex: str | None,
+    response_hex: str | None,
+    probe_name: str | None,
+    probe_arguments: tuple[str, ...],
+    iterations: int,
+    timeout: float,
+    throughput_bytes: int,
+    max_probes_per_hub: int,
+    verbose_inf: bool,
+    dict_output: bool,
+    verbose: bool = False,
+) -> None:
+    """
+    DEVICES: ports to benchmark, default all usb ttys.
+    --echo needs a loopback plug or echoing device, and is required for the throughput test.
+    Writes one JSON result per port and baud rate, recommended_timeout can be passed to find-device --timeout.
+    """
+
+    tty, verbose = tvicgvd(
+        ctx=ctx,
+        verbose=verbose,
+        verbose_inf=verbose_inf,
+        ic=ic,
+        gvd=gvd,
+    )
+
+    minone([echo, command_hex, probe_name])
+    if command_hex and not response_hex:
+        raise ValueError(f"{command_hex=} requires --response-hex to be specified as well.")
+
+    if probe_name:
+        _probe = make_probe(probe_name, **parse_probe_arguments(probe_arguments))
+    elif command_hex:
+        _probe = HexProbe(command_hex=command_hex, response_hex=response_hex)
+    else:
+        _probe = HexProbe(command_hex=ECHO_PAYLOAD.hex(), response_hex=ECHO_PAYLOAD.hex())
+
+    _devices = list(devices) or sort_devices_by_adapter(get_devices())
+    _results = benchmark_ports(
+        _devices,
+        baud_rates=list(baud_rates),
+        max_per_hub=max_probes_per_hub,
+        probe=_probe,
+        iterations=iterations,
+        timeout=timeout,
+        throughput_bytes=throughput_bytes if echo else 0,
+    )
+    for _ in _results:
+        output(
+            json.dumps(dataclass_to_dict(_)),
+            reason=None,
+            tty=tty,
+            dict_output=False,
+        )